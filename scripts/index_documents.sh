@@ -11,5 +11,5 @@ if [ -d ".venv" ]; then
 fi
 
 echo "Indexing documents from data/documents/..."
-python3 -m src.rag.indexer
+python3 -m src.index
 echo "Done."
@@ -29,7 +29,7 @@ bash scripts/download_models.sh
 
 # 4. Index sample documents
 echo "[4/5] Indexing sample documents..."
-python3 -m src.rag.indexer
+python3 -m src.index
 
 # 5. Install systemd service
 echo "[5/5] Installing systemd service..."
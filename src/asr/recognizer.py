@@ -1,5 +1,7 @@
 import json
 import logging
+from typing import Callable, Iterable
+
 import numpy as np
 from vosk import Model, KaldiRecognizer
 
@@ -7,8 +9,12 @@ logger = logging.getLogger(__name__)
 
 
 class Recognizer:
-    def __init__(self, model_path: str, sample_rate: int = 16000):
+    def __init__(self, model_path: str, sample_rate: int = 16000, model: Model = None):
         self.sample_rate = sample_rate
+        if model is not None:
+            # Reuse an already loaded model (e.g. shared with the wake word detector)
+            self.model = model
+            return
         logger.info(f"Loading Vosk model from {model_path}...")
         self.model = Model(model_path)
         logger.info("Vosk model loaded.")
@@ -18,19 +24,37 @@ class Recognizer:
         if len(audio) == 0:
             return ""
 
-        rec = KaldiRecognizer(self.model, self.sample_rate)
-        rec.SetWords(False)
-
         # Feed audio in chunks for streaming-like processing
         chunk_size = 4000
-        audio_bytes = audio.astype(np.int16).tobytes()
+        audio = audio.astype(np.int16)
+        frames = (audio[i : i + chunk_size] for i in range(0, len(audio), chunk_size))
+        return self.recognize_stream(frames)
+
+    def recognize_stream(self, frames: Iterable[np.ndarray],
+                         on_partial: Callable[[str], None] = None) -> str:
+        """Recognize speech while frames are still being recorded.
+
+        Each int16 frame is fed to a live recognizer as it arrives; on_partial
+        receives the current hypothesis. Returns the final text as soon as the
+        frame source is exhausted (end of speech).
+        """
+        rec = KaldiRecognizer(self.model, self.sample_rate)
+        rec.SetWords(False)
 
-        for i in range(0, len(audio_bytes), chunk_size * 2):
-            chunk = audio_bytes[i : i + chunk_size * 2]
-            rec.AcceptWaveform(chunk)
+        segments = []
+        for frame in frames:
+            if rec.AcceptWaveform(frame.astype(np.int16).tobytes()):
+                # Vosk closed a segment at an internal pause; keep its text
+                segment = json.loads(rec.Result()).get("text", "").strip()
+                if segment:
+                    segments.append(segment)
+            elif on_partial is not None:
+                partial = json.loads(rec.PartialResult()).get("partial", "").strip()
+                if partial:
+                    on_partial(" ".join(segments + [partial]))
 
-        result = json.loads(rec.FinalResult())
-        text = result.get("text", "").strip()
+        final = json.loads(rec.FinalResult()).get("text", "").strip()
+        text = " ".join(segments + [final]).strip()
 
         if text:
             logger.info(f"Recognized: {text}")
@@ -8,6 +8,8 @@ import numpy as np
 import sounddevice as sd
 from vosk import Model, KaldiRecognizer
 
+from src.audio.capture import AudioCapture
+
 logger = logging.getLogger(__name__)
 
 
@@ -15,14 +17,20 @@ class WakeWordDetector:
     """Listens for a wake word using Vosk restricted vocabulary."""
 
     def __init__(self, model_path: str, wake_words: list[str],
-                 sample_rate: int = 16000):
+                 sample_rate: int = 16000, model: Model = None,
+                 capture: AudioCapture = None):
         self.sample_rate = sample_rate
+        self.capture = capture
         self.wake_words = [w.lower() for w in wake_words]
         self._running = False
         self._thread = None
 
-        logger.info(f"Loading Vosk model for wake word detection...")
-        self.model = Model(model_path)
+        if model is not None:
+            # Grammar recognizer built on the shared free-form ASR model
+            self.model = model
+        else:
+            logger.info(f"Loading Vosk model for wake word detection...")
+            self.model = Model(model_path)
 
         # Build grammar with wake words
         grammar = json.dumps(self.wake_words + [""], ensure_ascii=False)
@@ -43,34 +51,54 @@ class WakeWordDetector:
         rec = KaldiRecognizer(self.model, self.sample_rate, self._grammar)
 
         try:
+            if self.capture is not None:
+                # Shared always-on capture: no device of our own
+                reader = self.capture.reader()
+                self._process_stream(reader.read, rec, callback, chunk_size,
+                                     on_callback_done=reader.skip_to_live)
+                return
+
             with sd.InputStream(
                 samplerate=self.sample_rate,
                 channels=1,
                 dtype="int16",
                 blocksize=chunk_size,
             ) as stream:
-                while self._running:
-                    data, _ = stream.read(chunk_size)
-                    audio_bytes = data.astype(np.int16).tobytes()
-
-                    if rec.AcceptWaveform(audio_bytes):
-                        result = json.loads(rec.Result())
-                        text = result.get("text", "").strip().lower()
-                        if text and any(w in text for w in self.wake_words):
-                            logger.info(f"Wake word detected: {text}")
-                            callback()
-                    else:
-                        partial = json.loads(rec.PartialResult())
-                        partial_text = partial.get("partial", "").strip().lower()
-                        if partial_text and any(w in partial_text for w in self.wake_words):
-                            logger.info(f"Wake word detected (partial): {partial_text}")
-                            rec.Reset()
-                            callback()
+                self._process_stream(lambda n: stream.read(n)[0], rec, callback, chunk_size)
 
         except Exception as e:
             if self._running:
                 logger.error(f"Wake word listener error: {e}")
 
+    def _process_stream(self, read: Callable[[int], np.ndarray], rec: KaldiRecognizer,
+                        callback: Callable[[], None], chunk_size: int,
+                        on_callback_done: Callable[[], None] = None):
+        while self._running:
+            data = read(chunk_size)
+            audio_bytes = data.astype(np.int16).tobytes()
+
+            detected = False
+            if rec.AcceptWaveform(audio_bytes):
+                result = json.loads(rec.Result())
+                text = result.get("text", "").strip().lower()
+                if text and any(w in text for w in self.wake_words):
+                    logger.info(f"Wake word detected: {text}")
+                    detected = True
+            else:
+                partial = json.loads(rec.PartialResult())
+                partial_text = partial.get("partial", "").strip().lower()
+                if partial_text and any(w in partial_text for w in self.wake_words):
+                    logger.info(f"Wake word detected (partial): {partial_text}")
+                    rec.Reset()
+                    detected = True
+
+            if detected:
+                callback()
+                if on_callback_done is not None:
+                    # Don't scan the question and the spoken answer for the wake word
+                    on_callback_done()
+                    rec.Reset()
+
     def stop(self) -> None:
         self._running = False
         if self._thread and self._thread.is_alive():
@@ -0,0 +1,362 @@
+"""Voice Assistant for University Department — speech-to-speech pipeline (run by src.main)."""
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Iterable, Union
+
+from src.audio.capture import AudioCapture
+from src.audio.recorder import Recorder
+from src.audio.player import Player
+from src.asr.recognizer import Recognizer
+from src.rag.answer_cache import AnswerCache
+from src.rag.embedder import Embedder
+from src.rag.retriever import Retriever
+from src.rag.generator import NO_INFO_ANSWER, Generator
+from src.tts.synthesizer import Synthesizer
+from src.hardware.button import Button
+from src.asr.wake_word import WakeWordDetector
+from src.rag.watcher import DocumentWatcher
+from src.utils.memory import ModelResidency, log_memory_usage
+from src.utils.sounds import ensure_sounds
+from src.utils.tracing import MetricsServer, tracer
+
+logger = logging.getLogger(__name__)
+
+NOT_HEARD_TEXT = "Я не услышал вопрос. Попробуйте ещё раз."
+NOT_RECOGNIZED_TEXT = "Извините, не удалось распознать вопрос. Повторите, пожалуйста."
+
+
+class VoiceAssistant:
+    def __init__(self, config: dict):
+        self.config = config
+        self._running = False
+        self._processing = False
+        self._lock = threading.Lock()
+
+        # Models stay loaded while they fit into the RAM budget
+        mem_cfg = config.get("memory", {})
+        self.residency = ModelResidency(
+            budget_mb=mem_cfg.get("budget_mb", 3200),
+            model_rss_mb=mem_cfg.get("model_rss_mb"),
+        )
+
+        # Initialize components
+        audio_cfg = config["audio"]
+        # One always-open microphone stream shared by wake word and recorder
+        self.capture = AudioCapture(
+            sample_rate=audio_cfg["sample_rate"],
+            channels=audio_cfg["channels"],
+        )
+        self.recorder = Recorder(
+            sample_rate=audio_cfg["sample_rate"],
+            channels=audio_cfg["channels"],
+            capture=self.capture,
+            pre_roll=audio_cfg.get("pre_roll", 0.3),
+        )
+        self.player = Player()
+
+        self.recognizer = Recognizer(
+            model_path=config["asr"]["model_path"],
+            sample_rate=audio_cfg["sample_rate"],
+        )
+        self.residency.register("vosk")
+
+        rag_cfg = config["rag"]
+        self.embedder = Embedder(
+            rag_cfg["embedder"]["model_path"],
+            residency=self.residency,
+            query_cache_size=rag_cfg["embedder"].get("query_cache_size", 0),
+        )
+        index_cfg = rag_cfg["index"]
+        self.retriever = Retriever(
+            faiss_path=index_cfg["faiss_path"],
+            db_path=index_cfg["db_path"],
+            cache_chunks=index_cfg.get("cache_chunks", False),
+            ef_search=index_cfg.get("hnsw", {}).get("ef_search"),
+            nprobe=index_cfg.get("ivfpq", {}).get("nprobe"),
+        )
+
+        # Answers to near-identical questions are reused until the index changes
+        self.answer_cache = None
+        cache_cfg = rag_cfg.get("answer_cache", {})
+        if cache_cfg.get("enabled", False):
+            self.answer_cache = AnswerCache(
+                threshold=cache_cfg.get("threshold", 0.95),
+                ttl=cache_cfg.get("ttl_seconds", 3600),
+                capacity=cache_cfg.get("capacity", 256),
+            )
+            tracer.add_collector(self.answer_cache.prometheus_text)
+
+        gen_cfg = rag_cfg.get("generator", {})
+        self.generator = Generator(
+            model_path=gen_cfg.get("model_path"),
+            mode=gen_cfg.get("mode", "template"),
+            max_tokens=gen_cfg.get("max_tokens", 100),
+            context_size=gen_cfg.get("context_size", 512),
+            residency=self.residency,
+            idle_timeout=gen_cfg.get("idle_timeout", 300),
+        )
+
+        tts_cfg = config["tts"]
+        self.synthesizer = Synthesizer(
+            model_path=tts_cfg["model_path"],
+            sample_rate=tts_cfg["sample_rate"],
+            residency=self.residency,
+            cache_path=tts_cfg.get("cache_path"),
+            cache_max_mb=tts_cfg.get("cache_max_mb", 200),
+        )
+
+        hw_cfg = config["hardware"]["button"]
+        self.button = Button(
+            gpio_pin=hw_cfg["gpio_pin"],
+            use_keyboard_fallback=hw_cfg.get("use_keyboard_fallback", True),
+        )
+
+        # Wake word detector
+        self.wake_word_detector = None
+        ww_cfg = config.get("wake_word", {})
+        if ww_cfg.get("enabled", False):
+            self.wake_word_detector = WakeWordDetector(
+                model_path=config["asr"]["model_path"],
+                wake_words=[ww_cfg["phrase"]],
+                sample_rate=audio_cfg["sample_rate"],
+                model=self.recognizer.model,
+                capture=self.capture,
+            )
+        log_memory_usage("after ASR models load")
+
+        # Document watcher and the worker processes that parse for it
+        self.doc_watcher = None
+        self.ingest_pool = None
+
+        # Per-stage latency metrics
+        metrics_cfg = config.get("metrics", {})
+        tracer.window = metrics_cfg.get("window", 500)
+        self.metrics_file = metrics_cfg.get("file")
+        self.metrics_server = None
+        if metrics_cfg.get("http_port"):
+            self.metrics_server = MetricsServer(tracer, port=metrics_cfg["http_port"])
+
+        # Ensure system sounds exist
+        sounds_dir = os.path.dirname(config["sounds"]["activate"])
+        ensure_sounds(sounds_dir)
+
+    def handle_query(self, pre_roll: bool = True):
+        """Full speech-to-speech pipeline: record → ASR → RAG → TTS → play.
+
+        pre_roll=False drops the audio before the trigger (wake word path:
+        it holds the tail of the wake phrase).
+        """
+        with self._lock:
+            if self._processing:
+                return
+            self._processing = True
+
+        try:
+            # Start the recording cursor at the trigger, before the activation sound
+            reader = self.recorder.open_reader(pre_roll=pre_roll)
+
+            # 1. Activation sound
+            with tracer.stage("activation_sound"):
+                self.player.play_sound(self.config["sounds"]["activate"])
+            # The microphone heard the beep: detect speech only after it
+            listen_from = self.recorder.live_position()
+
+            # 2-3. Record and recognize at the same time: speech → text
+            audio_cfg = self.config["audio"]
+            frames = self.recorder.stream_until_silence(
+                silence_threshold=audio_cfg["silence_threshold"],
+                silence_duration=audio_cfg["silence_duration"],
+                max_duration=audio_cfg["max_record_seconds"],
+                reader=reader,
+                listen_from=listen_from,
+            )
+            text = self.recognizer.recognize_stream(
+                frames, on_partial=lambda partial: logger.debug(f"Partial: {partial}")
+            )
+            speech_ended_at = self._trace_recording()
+
+            if not text:
+                if not self.recorder.speech_detected:
+                    self._speak(NOT_HEARD_TEXT, since=speech_ended_at)
+                else:
+                    self._speak(NOT_RECOGNIZED_TEXT, since=speech_ended_at)
+                return
+
+            logger.info(f"User asked: {text}")
+
+            # 4. RAG: embed → search → generate (models stay warm within RAM budget)
+            with tracer.stage("embed"):
+                query_embedding = self.embedder.embed([text])
+
+            if self.answer_cache is not None:
+                self.retriever.refresh()
+                generation = self.retriever.generation
+                cached = self.answer_cache.get(query_embedding, generation)
+                if cached is not None:
+                    logger.info(f"Answer (cached): {cached}")
+                    self._speak(cached, since=speech_ended_at)
+                    return
+
+            chunks = self.retriever.search(
+                query_embedding,
+                top_k=self.config["rag"].get("top_k", 3),
+            )
+
+            answer_parts = []
+
+            def answer_pieces():
+                with tracer.stage("generate"):
+                    for piece in self.generator.generate_stream(text, chunks):
+                        answer_parts.append(piece)
+                        yield piece
+
+            # 5. TTS: speak each sentence as soon as the generator completes it
+            self._speak(answer_pieces(), since=speech_ended_at)
+            answer = "".join(answer_parts)
+            logger.info(f"Answer: {answer}")
+
+            if self.answer_cache is not None and answer:
+                self.answer_cache.put(query_embedding, answer, generation)
+
+        except Exception as e:
+            logger.error(f"Error in pipeline: {e}", exc_info=True)
+            try:
+                self.player.play_sound(self.config["sounds"]["error"])
+            except Exception:
+                pass
+        finally:
+            self._processing = False
+            self._export_metrics()
+
+    def _trace_recording(self):
+        """Record recording / end-of-speech / ASR timings of the last query.
+
+        Recording and ASR run together, so ASR is the time from the end of
+        speech to the final text. Returns the end-of-speech timestamp.
+        """
+        recorder = self.recorder
+        if recorder.speech_ended_at is None:
+            return None
+        tracer.record("recording", recorder.speech_ended_at - recorder.recording_started_at)
+        tracer.record("end_of_speech", recorder.trailing_silence)
+        tracer.record("asr", time.perf_counter() - recorder.speech_ended_at)
+        return recorder.speech_ended_at
+
+    def _export_metrics(self):
+        if not self.metrics_file:
+            return
+        try:
+            tracer.write_prometheus(self.metrics_file)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.metrics_file}: {e}")
+
+    def _speak(self, text: Union[str, Iterable[str]], since: float = None):
+        """Synthesize and play text (or streamed text pieces) sentence by sentence.
+
+        With `since` (a perf_counter timestamp, normally the end of speech),
+        the delay until the first audio is ready is traced as first_audio.
+        """
+        chunks = self.synthesizer.synthesize_stream(text)
+        first = next(chunks, None)
+        if first is None:
+            return
+        if since is not None:
+            tracer.record("first_audio", time.perf_counter() - since)
+        # sample_rate is known once the first sentence is synthesized
+        self.player.play_stream(itertools.chain([first], chunks), self.synthesizer.sample_rate)
+
+    def start(self):
+        """Start the assistant — listen for button press and/or wake word."""
+        self._running = True
+
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+
+        # Open the microphone once for the whole session
+        self.capture.start()
+
+        # Load retriever index at startup (upgrading an older database first)
+        from src.rag.indexer import init_db
+        init_db(self.config["rag"]["index"]["db_path"])
+        self.retriever.load_index()
+
+        # Pre-load TTS (stays in memory while within RAM budget)
+        self.synthesizer.preload()
+        # Fixed phrases play straight from the TTS cache
+        self.synthesizer.prerender([NOT_HEARD_TEXT, NOT_RECOGNIZED_TEXT, NO_INFO_ANSWER])
+
+        # Start document watcher
+        rag_cfg = self.config["rag"]
+        from src.rag.document_loader import DocumentLoader
+        loader = DocumentLoader(
+            chunk_size=rag_cfg.get("chunk_size", 400),
+            chunk_overlap=rag_cfg.get("chunk_overlap", 50),
+        )
+        # Long-lived parse workers, fewer than all cores so queries stay responsive
+        from src.rag.ingest import IngestPool, default_workers
+        self.ingest_pool = IngestPool(
+            loader,
+            workers=rag_cfg["index"].get("ingest_workers") or default_workers(background=True),
+        )
+        watcher_cfg = rag_cfg.get("watcher", {})
+        self.doc_watcher = DocumentWatcher(
+            documents_path=rag_cfg["documents_path"],
+            indexer_factory=lambda: self._create_indexer(rag_cfg, loader),
+            poll_interval=watcher_cfg.get("poll_interval", 60),
+            on_reindexed=self.retriever.refresh,
+            debounce=watcher_cfg.get("debounce_seconds", 2.0),
+            use_inotify=watcher_cfg.get("use_inotify", True),
+        )
+        self.doc_watcher.start()
+
+        # Setup button
+        logger.info("Voice assistant ready. Press button or Enter to ask a question.")
+        self.button.on_press(self.handle_query)
+
+        # Start wake word detector
+        if self.wake_word_detector:
+            logger.info(f"Wake word detection enabled: '{self.config['wake_word']['phrase']}'")
+            self.wake_word_detector.listen(lambda: self.handle_query(pre_roll=False))
+
+        # Keep main thread alive
+        try:
+            while self._running:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _create_indexer(self, rag_cfg, loader):
+        from src.rag.indexer import Indexer
+        index_cfg = rag_cfg["index"]
+        index_type = index_cfg.get("type", "flat")
+        return Indexer(
+            faiss_path=index_cfg["faiss_path"],
+            db_path=index_cfg["db_path"],
+            embedder=self.embedder,
+            loader=loader,
+            index_type=index_type,
+            index_params=index_cfg.get(index_type),
+            ingest_pool=self.ingest_pool,
+        )
+
+    def stop(self):
+        """Graceful shutdown."""
+        logger.info("Shutting down...")
+        self._running = False
+        self.button.cleanup()
+        self.generator.unload()
+        if self.wake_word_detector:
+            self.wake_word_detector.stop()
+        if self.doc_watcher:
+            self.doc_watcher.stop()
+        if self.ingest_pool is not None:
+            self.ingest_pool.shutdown()
+        self.capture.stop()
+        self.retriever.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
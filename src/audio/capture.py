@@ -0,0 +1,117 @@
+"""Always-on microphone capture shared by the wake word detector and the recorder."""
+import logging
+import time
+
+import numpy as np
+import sounddevice as sd
+
+logger = logging.getLogger(__name__)
+
+
+class AudioCapture:
+    """Single input stream writing into a ring buffer that several readers consume.
+
+    The audio callback is the only writer: it copies samples into the ring and
+    then advances a monotonically increasing sample counter, so readers never
+    take a lock and never block the device.
+    """
+
+    def __init__(self, sample_rate: int = 16000, channels: int = 1,
+                 buffer_seconds: float = 10.0, block_duration: float = 0.1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_duration = block_duration
+        self._capacity = int(sample_rate * buffer_seconds) * channels
+        self._buffer = np.zeros(self._capacity, dtype=np.int16)
+        self._written = 0  # total samples ever written
+        self._stream = None
+
+    @property
+    def running(self) -> bool:
+        return self._stream is not None
+
+    @property
+    def position(self) -> int:
+        """Total samples captured so far (the live position of a new reader)."""
+        return self._written
+
+    def start(self):
+        """Open the input device once; it stays open until stop()."""
+        if self._stream is not None:
+            return
+        self._stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=self.channels,
+            dtype="int16",
+            blocksize=int(self.sample_rate * self.block_duration),
+            callback=self._callback,
+        )
+        self._stream.start()
+        logger.info("Audio capture started")
+
+    def stop(self):
+        if self._stream is None:
+            return
+        stream, self._stream = self._stream, None
+        stream.stop()
+        stream.close()
+        logger.info("Audio capture stopped")
+
+    def reader(self, pre_roll: float = 0.0) -> "CaptureReader":
+        """New cursor at the live position, moved back by pre_roll seconds."""
+        back = int(pre_roll * self.sample_rate) * self.channels
+        start = max(self._written - back, self._written - self._capacity, 0)
+        return CaptureReader(self, start)
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            logger.debug(f"Audio capture status: {status}")
+        samples = indata.reshape(-1)[-self._capacity:]
+        n = len(samples)
+        pos = self._written % self._capacity
+        first = min(n, self._capacity - pos)
+        self._buffer[pos : pos + first] = samples[:first]
+        self._buffer[: n - first] = samples[first:]
+        # Publish only after the samples are in place
+        self._written += n
+
+
+class CaptureReader:
+    """Independent read cursor over an AudioCapture ring buffer."""
+
+    def __init__(self, capture: AudioCapture, position: int):
+        self._capture = capture
+        self._pos = position
+
+    @property
+    def position(self) -> int:
+        """Capture position of the next sample read() returns."""
+        return self._pos
+
+    def read(self, frames: int) -> np.ndarray:
+        """Block until `frames` frames are available; returns [frames, channels] int16."""
+        capture = self._capture
+        n = frames * capture.channels
+        while capture._written - self._pos < n:
+            if not capture.running:
+                raise RuntimeError("Audio capture is not running")
+            time.sleep(0.005)
+
+        oldest = capture._written - capture._capacity
+        if self._pos < oldest:
+            logger.warning(
+                f"Audio reader fell behind by {(oldest - self._pos) / capture.sample_rate:.1f}s"
+            )
+            self._pos = oldest
+
+        pos = self._pos % capture._capacity
+        first = min(n, capture._capacity - pos)
+        out = np.empty(n, dtype=np.int16)
+        out[:first] = capture._buffer[pos : pos + first]
+        out[first:] = capture._buffer[: n - first]
+        self._pos += n
+        return out.reshape(-1, capture.channels)
+
+    def skip_to_live(self):
+        """Drop everything buffered so the next read returns fresh audio."""
+        self._pos = self._capture._written
@@ -1,5 +1,7 @@
 import logging
 import wave
+from typing import Iterable
+
 import numpy as np
 import sounddevice as sd
 
@@ -14,6 +16,16 @@ class Player:
         sd.play(audio, samplerate=sample_rate)
         sd.wait()
 
+    def play_stream(self, chunks: Iterable[np.ndarray], sample_rate: int = 22050) -> None:
+        """Play audio chunks back-to-back through one continuous output stream.
+
+        Chunks are written as soon as they arrive; blocks until all are played.
+        """
+        with sd.OutputStream(samplerate=sample_rate, channels=1, dtype="int16") as stream:
+            for chunk in chunks:
+                if len(chunk) > 0:
+                    stream.write(np.asarray(chunk, dtype=np.int16).reshape(-1, 1))
+
     def play_sound(self, sound_path: str) -> None:
         """Play a WAV sound file."""
         try:
@@ -1,14 +1,60 @@
 import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
 import numpy as np
 import sounddevice as sd
 
+from src.audio.capture import AudioCapture, CaptureReader
+
 logger = logging.getLogger(__name__)
 
 
 class Recorder:
-    def __init__(self, sample_rate: int = 16000, channels: int = 1):
+    def __init__(self, sample_rate: int = 16000, channels: int = 1,
+                 capture: AudioCapture = None, pre_roll: float = 0.0):
         self.sample_rate = sample_rate
         self.channels = channels
+        self.capture = capture
+        self.pre_roll = pre_roll
+        # Set by the last recording (perf_counter timestamps, for tracing)
+        self.speech_detected = False
+        self.recording_started_at = None
+        self.speech_ended_at = None
+        self.trailing_silence = 0.0
+
+    def open_reader(self, pre_roll: bool = True) -> CaptureReader:
+        """Start a recording cursor now, including pre_roll seconds of past audio.
+
+        Call at the trigger moment so speech that starts during the activation
+        sound is kept. Pass pre_roll=False when the audio before the trigger
+        is not part of the question (e.g. it holds the wake word). Returns
+        None when there is no shared capture.
+        """
+        if self.capture is None:
+            return None
+        return self.capture.reader(pre_roll=self.pre_roll if pre_roll else 0.0)
+
+    def live_position(self) -> int:
+        """Current shared capture position (None without a shared capture)."""
+        if self.capture is None:
+            return None
+        return self.capture.position
+
+    @contextmanager
+    def _frame_source(self, chunk_samples: int, reader: CaptureReader = None):
+        """Yield a read(n) function over `reader` or a private stream."""
+        if reader is not None:
+            yield reader.read
+            return
+        with sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=self.channels,
+            dtype="int16",
+            blocksize=chunk_samples,
+        ) as stream:
+            yield lambda n: stream.read(n)[0]
 
     def record_until_silence(
         self,
@@ -17,44 +63,79 @@ class Recorder:
         max_duration: float = 15.0,
     ) -> np.ndarray:
         """Record audio from microphone until silence is detected."""
+        frames = list(self.stream_until_silence(
+            silence_threshold=silence_threshold,
+            silence_duration=silence_duration,
+            max_duration=max_duration,
+        ))
+
+        if not frames:
+            return np.array([], dtype=np.int16)
+
+        audio = np.concatenate(frames, axis=0).flatten()
+        logger.info(f"Recorded {len(audio) / self.sample_rate:.1f}s of audio")
+        return audio
+
+    def stream_until_silence(
+        self,
+        silence_threshold: float = 0.03,
+        silence_duration: float = 1.5,
+        max_duration: float = 15.0,
+        reader: CaptureReader = None,
+        listen_from: int = None,
+    ) -> Iterator[np.ndarray]:
+        """Yield 100ms int16 frames from the microphone as they arrive, until silence.
+
+        With a shared capture, frames come from `reader` (see open_reader) or
+        from the live position; otherwise a private input stream is opened.
+        Frames that start before the capture position `listen_from` (pre-roll
+        and the activation sound) are yielded for ASR but not used to detect
+        speech or silence.
+        """
         chunk_duration = 0.1  # 100ms chunks
         chunk_samples = int(self.sample_rate * chunk_duration)
         silence_chunks = int(silence_duration / chunk_duration)
         max_chunks = int(max_duration / chunk_duration)
 
-        frames = []
         silent_count = 0
         has_speech = False
+        self.speech_detected = False
+        self.speech_ended_at = None
+        self.trailing_silence = 0.0
 
         logger.info("Recording started...")
+        self.recording_started_at = time.perf_counter()
 
-        with sd.InputStream(
-            samplerate=self.sample_rate,
-            channels=self.channels,
-            dtype="int16",
-            blocksize=chunk_samples,
-        ) as stream:
+        if reader is None and self.capture is not None:
+            reader = self.capture.reader()
+        if reader is None:
+            listen_from = None
+
+        with self._frame_source(chunk_samples, reader) as read:
             for _ in range(max_chunks):
-                data, _ = stream.read(chunk_samples)
-                frames.append(data.copy())
+                if listen_from is not None and reader.position < listen_from:
+                    yield read(chunk_samples).copy()
+                    continue
+
+                data = read(chunk_samples)
+                yield data.copy()
 
                 amplitude = np.abs(data).mean() / 32768.0
 
                 if amplitude > silence_threshold:
                     has_speech = True
+                    self.speech_detected = True
                     silent_count = 0
                 else:
                     silent_count += 1
 
                 if has_speech and silent_count >= silence_chunks:
+                    logger.info("End of speech detected")
                     break
 
-        if not frames:
-            return np.array([], dtype=np.int16)
-
-        audio = np.concatenate(frames, axis=0).flatten()
-        logger.info(f"Recorded {len(audio) / self.sample_rate:.1f}s of audio")
-        return audio
+        self.speech_ended_at = time.perf_counter()
+        # Time spent waiting for silence before the end of speech was declared
+        self.trailing_silence = silent_count * chunk_duration if has_speech else 0.0
 
     def record_fixed(self, duration: float) -> np.ndarray:
         """Record audio for a fixed duration."""
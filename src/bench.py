@@ -0,0 +1,268 @@
+"""Offline end-to-end benchmark: replay recorded questions through the pipeline.
+
+    python -m src.bench --wavs data/bench [--labels data/bench/labels.json]
+                        [--config config/assistant.yaml] [--output bench.json]
+                        [--warmup 1] [--repeat 1] [--no-tts]
+
+Each WAV goes through Recognizer → Embedder → Retriever → Generator →
+Synthesizer as in handle_query (LLM pieces streamed into sentence-by-sentence
+synthesis), but from files, without audio devices and without playback. labels.json maps a WAV file name to the document (or list of
+documents) that answers it; retrieval hit rate is computed over those.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import wave
+from datetime import datetime
+
+import numpy as np
+
+from src.asr.recognizer import Recognizer
+from src.config import load_config
+from src.rag.embedder import Embedder
+from src.rag.generator import Generator
+from src.rag.indexer import init_db
+from src.rag.retriever import Retriever
+from src.tts.synthesizer import Synthesizer
+from src.utils.memory import ModelResidency, read_peak_rss_kb
+from src.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.1  # same frame size as the live recorder
+
+
+def read_wav(path: str, sample_rate: int) -> np.ndarray:
+    """Mono int16 samples of a WAV file, linearly resampled to sample_rate."""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit PCM")
+        rate = wf.getframerate()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if wf.getnchannels() > 1:
+            audio = audio[:: wf.getnchannels()]  # first channel only
+    if rate != sample_rate and len(audio) > 0:
+        n = int(len(audio) * sample_rate / rate)
+        audio = np.interp(
+            np.linspace(0, len(audio) - 1, n), np.arange(len(audio)), audio
+        ).astype(np.int16)
+    return audio
+
+
+def load_labels(path: str) -> dict[str, list[str]]:
+    """{wav file name: [acceptable document names]} from a JSON object."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        labels = json.load(f)
+    return {name: [docs] if isinstance(docs, str) else list(docs) for name, docs in labels.items()}
+
+
+class Bench:
+    """Pipeline components built from the assistant config, minus audio I/O.
+
+    Query-level caches (answer cache, query embeddings, TTS audio) are left
+    off so every run measures the models rather than the caches.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.sample_rate = config["audio"]["sample_rate"]
+        self.top_k = config["rag"].get("top_k", 3)
+
+        mem_cfg = config.get("memory", {})
+        self.residency = ModelResidency(
+            budget_mb=mem_cfg.get("budget_mb", 3200),
+            model_rss_mb=mem_cfg.get("model_rss_mb"),
+        )
+
+        self.recognizer = Recognizer(config["asr"]["model_path"], sample_rate=self.sample_rate)
+        self.residency.register("vosk")
+
+        rag_cfg = config["rag"]
+        self.embedder = Embedder(rag_cfg["embedder"]["model_path"], residency=self.residency)
+        index_cfg = rag_cfg["index"]
+        self.retriever = Retriever(
+            faiss_path=index_cfg["faiss_path"],
+            db_path=index_cfg["db_path"],
+            cache_chunks=index_cfg.get("cache_chunks", False),
+            ef_search=index_cfg.get("hnsw", {}).get("ef_search"),
+            nprobe=index_cfg.get("ivfpq", {}).get("nprobe"),
+        )
+
+        gen_cfg = rag_cfg.get("generator", {})
+        self.generator = Generator(
+            model_path=gen_cfg.get("model_path"),
+            mode=gen_cfg.get("mode", "template"),
+            max_tokens=gen_cfg.get("max_tokens", 100),
+            context_size=gen_cfg.get("context_size", 512),
+            residency=self.residency,
+            idle_timeout=gen_cfg.get("idle_timeout", 300),
+        )
+
+        tts_cfg = config["tts"]
+        self.synthesizer = Synthesizer(
+            model_path=tts_cfg["model_path"],
+            sample_rate=tts_cfg["sample_rate"],
+            residency=self.residency,
+        )
+
+    def run_query(self, audio: np.ndarray, synthesize: bool = True) -> dict:
+        """One question through the whole pipeline; returns what it produced."""
+        started = time.perf_counter()
+        frame = int(self.sample_rate * FRAME_SECONDS)
+        frames = (audio[i : i + frame] for i in range(0, len(audio), frame))
+
+        with tracer.stage("asr"):
+            text = self.recognizer.recognize_stream(frames)
+        asr_done = time.perf_counter()
+
+        result = {"text": text, "documents": [], "answer": "", "audio_s": 0.0}
+        if text:
+            with tracer.stage("embed"):
+                query_embedding = self.embedder.embed([text])
+            chunks = self.retriever.search(query_embedding, top_k=self.top_k)
+            # Per rank, every document the (deduplicated) chunk occurs in
+            result["documents"] = [c["document_names"] for c in chunks]
+
+            answer_parts = []
+
+            def answer_pieces():
+                with tracer.stage("generate"):
+                    for piece in self.generator.generate_stream(text, chunks):
+                        answer_parts.append(piece)
+                        yield piece
+
+            if synthesize:
+                # Sentences are synthesized while the generator is still
+                # decoding, so first_audio does not wait for the whole answer
+                samples = 0
+                for i, chunk in enumerate(self.synthesizer.synthesize_stream(answer_pieces())):
+                    if i == 0:
+                        tracer.record("first_audio", time.perf_counter() - asr_done)
+                    samples += len(chunk)
+                result["audio_s"] = round(samples / self.synthesizer.sample_rate, 2)
+            else:
+                for _ in answer_pieces():
+                    pass
+            result["answer"] = "".join(answer_parts)
+
+        elapsed = time.perf_counter() - started
+        tracer.record("total", elapsed)
+        result["latency_ms"] = round(elapsed * 1000, 1)
+        return result
+
+    def close(self):
+        self.generator.unload()
+        self.retriever.close()
+
+
+def _rate(results: list[dict], key: str):
+    return round(sum(r[key] for r in results) / len(results), 3) if results else None
+
+
+def run(config: dict, wav_dir: str, labels: dict[str, list[str]], warmup: int = 1,
+        repeat: int = 1, synthesize: bool = True) -> dict:
+    """Benchmark every WAV in wav_dir and return the JSON-ready report."""
+    wavs = sorted(f for f in os.listdir(wav_dir) if f.lower().endswith(".wav"))
+    if not wavs:
+        raise FileNotFoundError(f"No .wav files in {wav_dir}")
+
+    init_db(config["rag"]["index"]["db_path"])
+    bench = Bench(config)
+    try:
+        bench.retriever.load_index()
+        audio = {name: read_wav(os.path.join(wav_dir, name), bench.sample_rate) for name in wavs}
+
+        # Model loading is not part of the steady-state latency
+        for name in wavs[:warmup]:
+            bench.run_query(audio[name], synthesize)
+        tracer.window = max(tracer.window, len(wavs) * repeat)
+        tracer.reset()
+
+        results = []
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for name in wavs:
+                result = bench.run_query(audio[name], synthesize)
+                expected = labels.get(name) or []
+                found = result["documents"]
+                result.update({
+                    "audio": name,
+                    "expected": expected,
+                    "hit_at_1": bool(found) and any(d in expected for d in found[0]),
+                    "hit_at_k": any(d in expected for names in found for d in names),
+                })
+                results.append(result)
+        wall_s = time.perf_counter() - started
+    finally:
+        bench.close()
+
+    stages = tracer.summary()
+    speech_s = sum(len(a) for a in audio.values()) / bench.sample_rate * repeat
+    asr_s = stages.get("asr", {}).get("sum_s", 0.0)
+    labelled = [r for r in results if r["expected"]]
+
+    return {
+        "started_at": datetime.now().isoformat(),
+        "config": {
+            "chunk_size": config["rag"].get("chunk_size"),
+            "chunk_overlap": config["rag"].get("chunk_overlap"),
+            "top_k": bench.top_k,
+            "index_type": config["rag"]["index"].get("type", "flat"),
+            "generator_mode": config["rag"].get("generator", {}).get("mode", "template"),
+            "synthesize": synthesize,
+        },
+        "queries": len(results),
+        "wall_s": round(wall_s, 2),
+        "throughput_qps": round(len(results) / wall_s, 3) if wall_s else 0.0,
+        "asr_realtime_factor": round(asr_s / speech_s, 3) if speech_s else 0.0,
+        "retrieval": {
+            "labelled": len(labelled),
+            "hit_at_1": _rate(labelled, "hit_at_1"),
+            f"hit_at_{bench.top_k}": _rate(labelled, "hit_at_k"),
+        },
+        "peak_rss_mb": round(max([read_peak_rss_kb() / 1024]
+                                 + [s["peak_rss_mb"] for s in stages.values()]), 1),
+        "stages": stages,
+        "results": results,
+    }
+
+
+def main():
+    """CLI entry point: python -m src.bench --wavs DIR [--labels FILE] [--output FILE]"""
+    parser = argparse.ArgumentParser(description="Offline speech-to-speech pipeline benchmark")
+    parser.add_argument("--wavs", required=True, help="directory of recorded question WAVs")
+    parser.add_argument("--labels", help="JSON {wav name: document name(s)} "
+                                         "(default: labels.json in --wavs)")
+    parser.add_argument("--config", help="assistant config (default: config/assistant.yaml)")
+    parser.add_argument("--output", default="bench.json", help="JSON report path")
+    parser.add_argument("--warmup", type=int, default=1, help="queries run before measuring")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the WAV directory")
+    parser.add_argument("--no-tts", action="store_true", help="skip speech synthesis")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(name)s] %(message)s")
+    config = load_config(args.config)
+    labels = load_labels(args.labels or os.path.join(args.wavs, "labels.json"))
+
+    report = run(config, args.wavs, labels, warmup=args.warmup, repeat=args.repeat,
+                 synthesize=not args.no_tts)
+
+    print(f"{report['queries']} queries in {report['wall_s']}s "
+          f"({report['throughput_qps']} q/s), peak RSS {report['peak_rss_mb']} MB")
+    print(f"retrieval: {report['retrieval']}")
+    print(f"{'stage':<18}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'RSS MB':>9}")
+    for name, row in report["stages"].items():
+        print(f"{name:<18}{row['count']:>7}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['peak_rss_mb']:>9.1f}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Document indexing — CLI entry point: python -m src.index [--compact]
+
+Kept free of heavy imports: ingest worker processes (forkserver/spawn)
+re-import the main module, and must not load FAISS or the embedder with it.
+The indexer itself is in src.rag.indexer.
+"""
+import argparse
+import logging
+
+from src.config import load_config
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index department documents")
+    parser.add_argument("--compact", action="store_true",
+                        help="rebuild the FAISS index from stored vectors")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
+    config = load_config()
+    rag_cfg = config["rag"]
+
+    from src.rag.document_loader import DocumentLoader
+    from src.rag.embedder import Embedder
+    from src.rag.indexer import Indexer
+
+    loader = DocumentLoader(
+        chunk_size=rag_cfg.get("chunk_size", 400),
+        chunk_overlap=rag_cfg.get("chunk_overlap", 50),
+    )
+    embedder = Embedder(rag_cfg["embedder"]["model_path"])
+    index_cfg = rag_cfg["index"]
+    index_type = index_cfg.get("type", "flat")
+    indexer = Indexer(
+        faiss_path=index_cfg["faiss_path"],
+        db_path=index_cfg["db_path"],
+        embedder=embedder,
+        loader=loader,
+        index_type=index_type,
+        index_params=index_cfg.get(index_type),
+        ingest_workers=index_cfg.get("ingest_workers"),
+    )
+    indexer.index_directory(rag_cfg["documents_path"])
+    if args.compact:
+        indexer.compact()
+    logger.info("Indexing complete.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Semantic answer cache: reuse answers for questions whose embeddings nearly match."""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """LRU of (query embedding -> answer) matched by cosine similarity.
+
+    Entries expire after ttl seconds and the whole cache is dropped when the
+    index generation changes, so answers never outlive the documents they
+    were built from.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, capacity: int = 256):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, tuple[np.ndarray, str, float]]" = OrderedDict()
+        self._next_key = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def get(self, embedding: np.ndarray, generation=None):
+        """Cached answer for the closest query above the threshold, or None."""
+        query = embedding.reshape(-1).astype(np.float32)
+        with self._lock:
+            self._check_generation(generation)
+            self._drop_expired()
+
+            best_key, best_score = None, self.threshold
+            for key, (vector, _, _) in self._entries.items():
+                score = float(np.dot(vector, query))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            answer = self._entries[best_key][1]
+
+        logger.info(f"Answer cache hit (similarity {best_score:.3f}), "
+                    f"hit rate {self.hit_rate():.0%} ({self.hits}/{self.hits + self.misses})")
+        return answer
+
+    def put(self, embedding: np.ndarray, answer: str, generation=None):
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[self._next_key] = (
+                embedding.reshape(-1).astype(np.float32), answer, time.monotonic()
+            )
+            self._next_key += 1
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate(),
+            }
+
+    def prometheus_text(self) -> str:
+        """Hit/miss counters and size in the Prometheus text format (see Tracer.add_collector)."""
+        stats = self.stats()
+        return (
+            "# HELP assistant_answer_cache_hits_total Questions answered from the answer cache.\n"
+            "# TYPE assistant_answer_cache_hits_total counter\n"
+            f"assistant_answer_cache_hits_total {stats['hits']}\n"
+            "# HELP assistant_answer_cache_misses_total Questions not found in the answer cache.\n"
+            "# TYPE assistant_answer_cache_misses_total counter\n"
+            f"assistant_answer_cache_misses_total {stats['misses']}\n"
+            "# HELP assistant_answer_cache_entries Answers currently cached.\n"
+            "# TYPE assistant_answer_cache_entries gauge\n"
+            f"assistant_answer_cache_entries {stats['entries']}\n"
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                logger.info("Index changed, answer cache cleared")
+            self._entries.clear()
+            self._generation = generation
+
+    def _drop_expired(self):
+        cutoff = time.monotonic() - self.ttl
+        for key in [k for k, (_, _, created) in self._entries.items() if created < cutoff]:
+            del self._entries[key]
@@ -85,10 +85,12 @@ class DocumentLoader:
         return chunks
 
     def get_supported_files(self, directory: str) -> list[str]:
-        """List all supported files in a directory."""
+        """List all supported files in a directory and its subdirectories."""
         supported = {".txt", ".pdf", ".docx"}
         files = []
-        for name in os.listdir(directory):
-            if Path(name).suffix.lower() in supported:
-                files.append(os.path.join(directory, name))
+        for root, dirs, names in os.walk(directory):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]  # skip .git, .Trash etc.
+            for name in names:
+                if Path(name).suffix.lower() in supported:
+                    files.append(os.path.join(root, name))
         return sorted(files)
@@ -1,19 +1,34 @@
 import logging
 import os
+import threading
+from collections import OrderedDict
+
 import numpy as np
-from src.utils.memory import force_gc, log_memory_usage
+from src.utils.memory import ModelResidency, ResidentModel, force_gc, log_memory_usage
 
 logger = logging.getLogger(__name__)
 
+# Sequence lengths a batch is padded to (shortest that fits the longest item)
+PAD_BUCKETS = (32, 64, 128, 256, 512)
+
 
-class Embedder:
+class Embedder(ResidentModel):
     """Sentence embedder using rubert-tiny2 via ONNX or transformers."""
 
-    def __init__(self, model_path: str):
+    residency_name = "embedder"
+
+    def __init__(self, model_path: str, residency: ModelResidency = None,
+                 query_cache_size: int = 0):
         self.model_path = model_path
+        self._residency = residency
         self._tokenizer = None
         self._session = None
+        self._model = None
         self._use_onnx = False
+        # LRU of (model, normalized text) -> vector for repeated questions
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[tuple[str, str], np.ndarray]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
 
     def load(self):
         """Load the embedding model into RAM."""
@@ -34,8 +49,10 @@ class Embedder:
 
         tokenizer_path = os.path.join(self.model_path, "tokenizer.json")
         self._tokenizer = Tokenizer.from_file(tokenizer_path)
-        self._tokenizer.enable_truncation(max_length=512)
-        self._tokenizer.enable_padding(length=512)
+        self._tokenizer.enable_truncation(max_length=PAD_BUCKETS[-1])
+        self._tokenizer.no_padding()  # padded per batch in _run_onnx
+        pad_id = self._tokenizer.token_to_id("[PAD]")
+        self._pad_id = pad_id if pad_id is not None else 0
 
         sess_options = ort.SessionOptions()
         sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
@@ -55,18 +72,88 @@ class Embedder:
         self._use_onnx = False
         logger.info("Embedder loaded (transformers)")
 
+    def is_loaded(self) -> bool:
+        return self._tokenizer is not None
+
     def embed(self, texts: list[str]) -> np.ndarray:
-        """Compute embeddings for a list of texts. Returns [N, dim] array."""
-        if self._use_onnx:
-            return self._embed_onnx(texts)
+        """Compute embeddings for a list of texts. Returns [N, dim] array.
+
+        With query_cache_size > 0, texts seen before (after normalization) are
+        served from the LRU without loading or running the model.
+        """
+        if self.query_cache_size <= 0:
+            return self._embed_uncached(texts)
+
+        keys = [(self.model_path, " ".join(t.lower().split())) for t in texts]
+        with self._query_cache_lock:
+            cached = [self._query_cache.get(k) for k in keys]
+            for k, vector in zip(keys, cached):
+                if vector is not None:
+                    self._query_cache.move_to_end(k)
+
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            computed = self._embed_uncached([texts[i] for i in missing]).astype(np.float32)
+            with self._query_cache_lock:
+                for i, vector in zip(missing, computed):
+                    vector.flags.writeable = False
+                    cached[i] = vector
+                    self._query_cache[keys[i]] = vector
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
         else:
-            return self._embed_transformers(texts)
+            logger.debug(f"Query embedding cache hit for {len(texts)} text(s)")
+
+        return np.vstack(cached)
+
+    def _embed_uncached(self, texts: list[str]) -> np.ndarray:
+        with self._in_use():
+            if self._use_onnx:
+                return self._embed_onnx(texts)
+            else:
+                return self._embed_transformers(texts)
+
+    def embed_batched(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        """Embed many texts in batches of similar length. Output keeps input order."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        with self._in_use():
+            if self._use_onnx:
+                encodings = self._tokenizer.encode_batch(texts)
+                lengths = [len(e.ids) for e in encodings]
+            else:
+                encodings = None
+                lengths = [len(t) for t in texts]
+
+            # Sorting by length keeps per-batch padding minimal
+            order = np.argsort(lengths, kind="stable")
+            batches = []
+            for i in range(0, len(order), batch_size):
+                idx = order[i : i + batch_size]
+                if encodings is not None:
+                    batches.append(self._run_onnx([encodings[j] for j in idx]))
+                else:
+                    batches.append(self._embed_transformers([texts[j] for j in idx]))
+
+        sorted_embeddings = np.vstack(batches)
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
 
     def _embed_onnx(self, texts: list[str]) -> np.ndarray:
-        encodings = self._tokenizer.encode_batch(texts)
-
-        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
-        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        return self._run_onnx(self._tokenizer.encode_batch(texts))
+
+    def _run_onnx(self, encodings: list) -> np.ndarray:
+        # Pad to the smallest bucket that fits the longest item, not to 512
+        longest = max(len(e.ids) for e in encodings)
+        length = next((b for b in PAD_BUCKETS if b >= longest), longest)
+
+        input_ids = np.full((len(encodings), length), self._pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for i, e in enumerate(encodings):
+            input_ids[i, : len(e.ids)] = e.ids
+            attention_mask[i, : len(e.ids)] = 1
         token_type_ids = np.zeros_like(input_ids)
 
         outputs = self._session.run(
@@ -101,8 +188,7 @@ class Embedder:
         """Free model from RAM."""
         self._session = None
         self._tokenizer = None
-        if hasattr(self, "_model"):
-            del self._model
+        self._model = None
         force_gc()
         log_memory_usage("after embedder unload")
         logger.info("Embedder unloaded")
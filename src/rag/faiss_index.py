@@ -0,0 +1,249 @@
+"""FAISS index types (flat / HNSW / IVF-PQ), their metadata and a recall/latency report."""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+DEFAULT_PARAMS = {
+    "flat": {},
+    "hnsw": {"m": 32, "ef_construction": 80, "ef_search": 64},
+    "ivfpq": {"nlist": 256, "m": 24, "nbits": 8, "nprobe": 16},
+}
+
+
+def index_params(index_type: str, params: dict = None) -> dict:
+    """Defaults for index_type overridden by the configured params."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected one of {INDEX_TYPES})")
+    merged = dict(DEFAULT_PARAMS[index_type])
+    merged.update(params or {})
+    return merged
+
+
+def ivfpq_nlist(n_train: int, params: dict) -> int:
+    """IVF lists to train on n_train vectors; 0 if too few to train IVF-PQ."""
+    # ~39 points per centroid keeps k-means meaningful
+    nlist = min(params["nlist"], n_train // 39)
+    if nlist < 1 or n_train < 2 ** params["nbits"]:
+        return 0
+    return nlist
+
+
+def create_index(index_type: str, dim: int, params: dict = None,
+                 train_vectors: np.ndarray = None) -> faiss.Index:
+    """Create an empty ID-mapped index, training it on train_vectors if the type needs it.
+
+    IVF-PQ falls back to a flat index while there are too few vectors to train
+    the coarse quantizer and the PQ codebooks.
+    """
+    params = index_params(index_type, params)
+
+    if index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, params["m"], faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = params["ef_construction"]
+        base.hnsw.efSearch = params["ef_search"]
+    elif index_type == "ivfpq":
+        n_train = 0 if train_vectors is None else len(train_vectors)
+        nlist = ivfpq_nlist(n_train, params)
+        if not nlist:
+            logger.warning(
+                f"Only {n_train} vectors: too few to train IVF-PQ, using a flat index"
+            )
+            base = faiss.IndexFlatIP(dim)
+        else:
+            quantizer = faiss.IndexFlatIP(dim)
+            base = faiss.IndexIVFPQ(quantizer, dim, nlist, params["m"], params["nbits"],
+                                    faiss.METRIC_INNER_PRODUCT)
+            base.train(train_vectors)
+            base.nprobe = params["nprobe"]
+            logger.info(f"Trained IVF-PQ (nlist={nlist}) on {n_train} vectors")
+    else:
+        base = faiss.IndexFlatIP(dim)
+
+    return faiss.IndexIDMap2(base)
+
+
+def set_search_params(index: faiss.Index, ef_search: int = None, nprobe: int = None):
+    """Apply query-time parameters; those that do not apply to the index are ignored."""
+    space = faiss.ParameterSpace()
+    for name, value in (("efSearch", ef_search), ("nprobe", nprobe)):
+        if value is None:
+            continue
+        try:
+            space.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass
+
+
+def read_index_mmap(path: str) -> faiss.Index:
+    """Read an index memory-mapped (pages shared, evictable under memory pressure).
+
+    Falls back to a regular read for index types that cannot be mapped.
+    """
+    # IO_FLAG_MMAP_IFC (faiss >= 1.8) maps flat codes too, IO_FLAG_MMAP only IVF lists
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError as e:
+        logger.info(f"Memory-mapped read not supported ({e}), reading index into RAM")
+        return faiss.read_index(path)
+
+
+def write_index_atomic(index: faiss.Index, path: str):
+    """Write to a temp file and rename over path, so readers never see a partial index."""
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def meta_path(faiss_path: str) -> str:
+    return faiss_path + ".meta.json"
+
+
+def save_meta(faiss_path: str, index: faiss.Index, index_type: str, params: dict,
+              generation: int = None):
+    """Write index type, build parameters and the DB generation next to the index file."""
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    meta = {
+        "type": index_type,
+        "base": type(base).__name__,
+        "params": params,
+        "dim": index.d,
+        "ntotal": index.ntotal,
+        "generation": generation,
+        "saved_at": datetime.now().isoformat(),
+    }
+    tmp_path = meta_path(faiss_path) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path(faiss_path))
+
+
+def load_meta(faiss_path: str) -> dict:
+    try:
+        with open(meta_path(faiss_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _load_vectors(db_path: str) -> np.ndarray:
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT embedding FROM chunks WHERE embedding IS NOT NULL"
+        ).fetchall()
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack([np.frombuffer(r[0], dtype=np.float32) for r in rows])
+
+
+def _measure(index: faiss.Index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies = []
+    found = []
+    for q in queries:
+        start = time.perf_counter()
+        _, ids = index.search(q.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    found = np.array(found)
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {
+        "recall": round(float(recall), 4),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "latency_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def recall_report(vectors: np.ndarray, k: int = 3, n_queries: int = 200,
+                  noise: float = 0.05, seed: int = 0,
+                  params: dict[str, dict] = None) -> list[dict]:
+    """Recall@k and per-query latency of each index type against exact search.
+
+    Queries are stored vectors with Gaussian noise, which approximates spoken
+    questions that paraphrase an indexed chunk. params maps an index type to
+    its configured parameters (rag.index.hnsw / rag.index.ivfpq), so each
+    type is built as it would be deployed; its configured ef_search / nprobe
+    is added to the search grid.
+    """
+    params = params or {}
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)]
+    queries = sample + rng.normal(0, noise, sample.shape).astype(np.float32)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-8)
+    queries = queries.astype(np.float32)
+
+    ids = np.arange(len(vectors), dtype=np.int64)
+    exact = create_index("flat", vectors.shape[1])
+    exact.add_with_ids(vectors, ids)
+    k = min(k, len(vectors))
+    _, truth = exact.search(queries, k)
+
+    hnsw = index_params("hnsw", params.get("hnsw"))
+    ivfpq = index_params("ivfpq", params.get("ivfpq"))
+    grid = [("flat", {}, {})]
+    grid += [("hnsw", hnsw, {"ef_search": ef})
+             for ef in sorted({16, 32, 64, 128, hnsw["ef_search"]})]
+    grid += [("ivfpq", ivfpq, {"nprobe": n})
+             for n in sorted({1, 4, 8, 16, 32, ivfpq["nprobe"]})]
+
+    report = []
+    built = {}
+    for index_type, params, search in grid:
+        if index_type not in built:
+            start = time.perf_counter()
+            index = create_index(index_type, vectors.shape[1], params, train_vectors=vectors)
+            index.add_with_ids(vectors, ids)
+            built[index_type] = (index, time.perf_counter() - start)
+        index, build_s = built[index_type]
+        set_search_params(index, **search)
+        row = {"type": index_type, **search, "build_s": round(build_s, 2)}
+        row.update(_measure(index, queries, truth, k))
+        report.append(row)
+    return report
+
+
+def main():
+    """CLI entry point: python -m src.rag.faiss_index [--k 3] [--queries 200] [--json FILE]"""
+    from src.config import load_config
+
+    parser = argparse.ArgumentParser(description="Recall@k vs latency of FAISS index types")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
+    config = load_config()
+    index_cfg = config["rag"]["index"]
+    vectors = _load_vectors(index_cfg["db_path"])
+    if len(vectors) == 0:
+        logger.error("No stored vectors: run python -m src.index first")
+        return
+
+    report = recall_report(vectors, k=args.k, n_queries=args.queries,
+                           params={t: index_cfg.get(t) for t in ("hnsw", "ivfpq")})
+
+    print(f"{len(vectors)} vectors, recall@{args.k}")
+    print(f"{'type':<7}{'param':<16}{'recall':>8}{'p50 ms':>10}{'p95 ms':>10}{'build s':>10}")
+    for row in report:
+        param = ", ".join(f"{k}={row[k]}" for k in ("ef_search", "nprobe") if k in row)
+        print(f"{row['type']:<7}{param:<16}{row['recall']:>8.3f}"
+              f"{row['latency_ms_p50']:>10.3f}{row['latency_ms_p95']:>10.3f}{row['build_s']:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "k": args.k, "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,59 @@
 import logging
-from src.utils.memory import force_gc, log_memory_usage
+from typing import Iterator
+
+from src.rag.llm_worker import LLMWorker
+from src.utils.memory import ModelResidency, ResidentModel
 
 logger = logging.getLogger(__name__)
 
+NO_INFO_ANSWER = "К сожалению, я не нашёл информацию по вашему вопросу в базе знаний кафедры."
+
 
-class Generator:
+class Generator(ResidentModel):
     """Answer generator: template mode (MVP) or LLM mode (enhanced)."""
 
+    residency_name = "llm"
+
     def __init__(self, model_path: str = None, mode: str = "template",
-                 max_tokens: int = 100, context_size: int = 512):
+                 max_tokens: int = 100, context_size: int = 512,
+                 residency: ModelResidency = None, idle_timeout: float = 300.0):
         self.model_path = model_path
         self.mode = mode
         self.max_tokens = max_tokens
         self.context_size = context_size
-        self._llm = None
+        self._residency = residency
+        self.idle_timeout = idle_timeout
+        self._worker = None
 
     def load(self):
-        """Load LLM model if in llm mode."""
+        """Start the persistent LLM worker if in llm mode."""
         if self.mode != "llm" or not self.model_path:
             return
+        if self._worker is not None and self._worker.is_alive:
+            return
+        worker = LLMWorker(
+            model_path=self.model_path,
+            context_size=self.context_size,
+            n_threads=4,
+            idle_timeout=self.idle_timeout,
+        )
+        worker.on_idle = lambda: self._on_worker_idle(worker)
         try:
-            log_memory_usage("before LLM load")
-            from llama_cpp import Llama
-            self._llm = Llama(
-                model_path=self.model_path,
-                n_ctx=self.context_size,
-                n_threads=4,
-                verbose=False,
-            )
-            log_memory_usage("after LLM load")
+            worker.start()
+            self._worker = worker
             logger.info("LLM loaded for generation")
         except Exception as e:
             logger.error(f"Failed to load LLM: {e}. Falling back to template mode.")
-            self._llm = None
+            self._worker = None
+
+    def _on_worker_idle(self, worker: LLMWorker):
+        """Worker unloaded itself after idling: drop it from RAM accounting."""
+        if self._worker is not worker:
+            return
+        if self._residency is not None:
+            self._residency.evict("llm")
+        else:
+            self.unload()
 
     def generate(self, query: str, context: list[dict]) -> str:
         """Generate answer from query and retrieved context chunks.
@@ -45,22 +66,42 @@ class Generator:
             Answer text string
         """
         if not context:
-            return "К сожалению, я не нашёл информацию по вашему вопросу в базе знаний кафедры."
+            return NO_INFO_ANSWER
 
-        if self.mode == "llm" and self._llm is not None:
-            return self._generate_llm(query, context)
+        if self.mode == "llm" and self.model_path:
+            with self._in_use():
+                if self._worker is not None:
+                    return self._generate_llm(query, context)
         return self._generate_template(query, context)
 
+    def generate_stream(self, query: str, context: list[dict]) -> Iterator[str]:
+        """Like generate(), but yields the answer in pieces as the LLM decodes it.
+
+        Template and no-context answers are yielded whole.
+        """
+        if context and self.mode == "llm" and self.model_path:
+            with self._in_use():
+                if self._worker is not None:
+                    yield from self._generate_llm_stream(query, context)
+                    return
+            # The LLM failed to load: answer from the template without a second attempt
+            yield self._generate_template(query, context)
+            return
+        yield self.generate(query, context)
+
+    def is_loaded(self) -> bool:
+        # False once the worker exited on its idle timeout
+        return self._worker is not None and self._worker.is_alive
+
     def _generate_template(self, query: str, context: list[dict]) -> str:
         """Simple template-based answer: return best matching chunk."""
         best = context[0]
         return f"По данным кафедры: {best['text']}"
 
-    def _generate_llm(self, query: str, context: list[dict]) -> str:
-        """Generate answer using local LLM."""
+    def _build_prompt(self, query: str, context: list[dict]) -> str:
         context_text = "\n\n".join(c["text"] for c in context[:2])
 
-        prompt = (
+        return (
             f"Ты — ассистент кафедры. Отвечай кратко и точно на русском языке, "
             f"используя только предоставленный контекст.\n\n"
             f"Контекст:\n{context_text}\n\n"
@@ -68,8 +109,12 @@ class Generator:
             f"Ответ:"
         )
 
+    def _generate_llm(self, query: str, context: list[dict]) -> str:
+        """Generate answer using local LLM."""
+        prompt = self._build_prompt(query, context)
+
         try:
-            output = self._llm(
+            output = self._worker.submit(
                 prompt,
                 max_tokens=self.max_tokens,
                 stop=["\n\n", "Вопрос:"],
@@ -84,11 +129,34 @@ class Generator:
         # Fallback to template
         return self._generate_template(query, context)
 
+    def _generate_llm_stream(self, query: str, context: list[dict]) -> Iterator[str]:
+        """Yield LLM tokens as they are decoded; template answer if none come."""
+        prompt = self._build_prompt(query, context)
+
+        produced = []
+        try:
+            for piece in self._worker.submit_stream(
+                prompt,
+                max_tokens=self.max_tokens,
+                stop=["\n\n", "Вопрос:"],
+                echo=False,
+            ):
+                if not produced:
+                    piece = piece.lstrip()
+                    if not piece:
+                        continue
+                produced.append(piece)
+                yield piece
+        except Exception as e:
+            logger.error(f"LLM generation failed: {e}")
+
+        if not produced:
+            # Fallback to template
+            yield self._generate_template(query, context)
+
     def unload(self):
-        """Free LLM from RAM."""
-        if self._llm is not None:
-            del self._llm
-            self._llm = None
-            force_gc()
-            log_memory_usage("after LLM unload")
+        """Stop the LLM worker, freeing the model from RAM."""
+        if self._worker is not None:
+            self._worker.stop()
+            self._worker = None
             logger.info("LLM unloaded")
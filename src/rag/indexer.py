@@ -2,223 +2,639 @@
 import hashlib
 import logging
 import os
+import queue
 import sqlite3
+import threading
 from datetime import datetime
+from typing import Iterable
 
 import faiss
 import numpy as np
 
-from src.config import load_config
+from src.rag import faiss_index
 from src.rag.document_loader import DocumentLoader
+from src.rag.ingest import IngestPool, default_workers, iter_parsed
 from src.rag.embedder import Embedder
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_DIM = 312  # rubert-tiny2
+
+EMBED_BATCH = 64  # chunks embedded and written together
+PIPELINE_DEPTH = 4  # items buffered between indexing stages
+
+_END_OF_STREAM = object()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Blocking put that gives up once stop is set. Returns False if it gave up."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    """Blocking get that returns None once stop is set."""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return None
+
+
+def chunk_hash(text: str) -> str:
+    """Content key of a chunk: identical text (up to whitespace) embeds once."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def _read_counter(conn: sqlite3.Connection, key: str) -> int:
+    return conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+
+def _write_counter(conn: sqlite3.Connection, key: str, value: int):
+    conn.execute("UPDATE meta SET value = ? WHERE key = ?", (value, key))
+
+
+def db_generation(conn: sqlite3.Connection) -> int:
+    """Number of committed changes to the stored chunks (saved with the FAISS index)."""
+    return _read_counter(conn, "generation")
+
+
+def init_db(db_path: str):
+    """Create the index database or bring an older one up to the current schema.
+
+    Chunks are stored once per distinct content (chunks) and linked to every
+    document they occur in (chunk_sources). The meta table holds the next
+    embedding_id (never reused, so an index a reader still holds cannot map
+    an id to another chunk's text) and the generation of the stored chunks.
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    with sqlite3.connect(db_path) as conn:
+        # WAL lets the retriever's long-lived connection read while we write
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY,
+                filename TEXT,
+                filepath TEXT,
+                format TEXT,
+                hash TEXT,
+                indexed_at TEXT,
+                chunk_count INTEGER,
+                stat TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT,
+                embedding_id INTEGER,
+                embedding BLOB,
+                content_hash TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_sources (
+                document_id TEXT,
+                chunk_index INTEGER,
+                embedding_id INTEGER,
+                FOREIGN KEY (document_id) REFERENCES documents(id)
+            )
+        """)
+
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            )
+        """)
+        conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) "
+            "SELECT 'next_embedding_id', COALESCE(MAX(embedding_id) + 1, 0) FROM chunks"
+        )
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+
+        # Databases created before vectors were persisted lack the column
+        columns = {r[1] for r in conn.execute("PRAGMA table_info(chunks)")}
+        if "embedding" not in columns:
+            conn.execute("ALTER TABLE chunks ADD COLUMN embedding BLOB")
+        if "content_hash" not in columns:
+            # One chunk row per document occurrence: hash the texts and move the
+            # document links to chunk_sources (duplicates merge on --compact)
+            conn.execute("ALTER TABLE chunks ADD COLUMN content_hash TEXT")
+            rows = conn.execute("SELECT id, text FROM chunks").fetchall()
+            conn.executemany(
+                "UPDATE chunks SET content_hash = ? WHERE id = ?",
+                [(chunk_hash(text or ""), chunk_id) for chunk_id, text in rows],
+            )
+            conn.execute(
+                "INSERT INTO chunk_sources (document_id, chunk_index, embedding_id) "
+                "SELECT document_id, chunk_index, embedding_id FROM chunks"
+            )
+        columns = {r[1] for r in conn.execute("PRAGMA table_info(documents)")}
+        if "stat" not in columns:
+            conn.execute("ALTER TABLE documents ADD COLUMN stat TEXT")
+
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(content_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_embedding ON chunks(embedding_id)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sources_document ON chunk_sources(document_id)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sources_embedding ON chunk_sources(embedding_id)"
+        )
+        conn.commit()
+
 
 class Indexer:
-    def __init__(self, faiss_path: str, db_path: str, embedder: Embedder, loader: DocumentLoader):
+    def __init__(self, faiss_path: str, db_path: str, embedder: Embedder, loader: DocumentLoader,
+                 index_type: str = "flat", index_params: dict = None,
+                 ingest_workers: int = None, ingest_pool: IngestPool = None):
         self.faiss_path = faiss_path
         self.db_path = db_path
         self.embedder = embedder
         self.loader = loader
+        # Processes hashing, parsing and chunking documents in parallel; a
+        # shared long-lived pool if given, else one per apply_changes call
+        self.ingest_workers = ingest_workers or default_workers()
+        self.ingest_pool = ingest_pool
+        self.index_type = index_type
+        self.index_params = faiss_index.index_params(index_type, index_params)
         self.index = None
+        self._generation = None  # DB generation the in-memory index reflects
+        self._needs_rebuild = False
         self._init_db()
 
     def _init_db(self):
-        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS documents (
-                    id TEXT PRIMARY KEY,
-                    filename TEXT,
-                    filepath TEXT,
-                    format TEXT,
-                    hash TEXT,
-                    indexed_at TEXT,
-                    chunk_count INTEGER
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS chunks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    document_id TEXT,
-                    text TEXT,
-                    chunk_index INTEGER,
-                    embedding_id INTEGER,
-                    FOREIGN KEY (document_id) REFERENCES documents(id)
-                )
-            """)
-            conn.commit()
+        init_db(self.db_path)
 
-    def _file_hash(self, filepath: str) -> str:
-        h = hashlib.sha256()
-        with open(filepath, "rb") as f:
-            for block in iter(lambda: f.read(8192), b""):
-                h.update(block)
-        return h.hexdigest()
+    def _file_stat(self, filepath: str) -> str:
+        """Cheap change signature: "mtime_ns:size:inode"."""
+        st = os.stat(filepath)
+        return f"{st.st_mtime_ns}:{st.st_size}:{st.st_ino}"
 
     def _doc_id(self, filepath: str) -> str:
         return hashlib.md5(filepath.encode()).hexdigest()
 
     def index_directory(self, documents_path: str):
-        """Index all supported documents in a directory."""
+        """Index all supported documents in a directory tree."""
         files = self.loader.get_supported_files(documents_path)
         if not files:
             logger.warning(f"No documents found in {documents_path}")
             return
 
         logger.info(f"Indexing {len(files)} documents from {documents_path}")
+        self.index_files(files)
+
+    def index_files(self, files: list[str]):
+        """Index or reindex exactly these files; other documents are not touched."""
+        self.apply_changes(added=files)
+
+    def apply_changes(self, added: Iterable[str] = (), changed: Iterable[str] = (),
+                      removed: Iterable[str] = ()):
+        """Apply a change set and commit it as one index generation.
+
+        Removed documents are deleted and added/changed files (re)indexed in
+        a single SQLite transaction, and the FAISS index is saved (or rebuilt,
+        if it cannot remove vectors) once at the end.
+
+        Indexing runs as a pipeline with bounded queues: the ingest pool
+        parses documents, an embedding thread turns their chunks into batches
+        of vectors, and this thread writes them to SQLite and appends them to
+        FAISS. Memory stays flat however large the corpus.
+        """
+        files = list(added) + list(changed)
+        removed = list(removed)
+        if not files and not removed:
+            return
 
-        all_chunks = []
-        chunk_metadata = []
-
-        for filepath in files:
-            file_hash = self._file_hash(filepath)
-            doc_id = self._doc_id(filepath)
-
-            # Check if already indexed with same hash
-            with sqlite3.connect(self.db_path) as conn:
+        # Unchanged stat: skip without reading the file
+        stats = {}
+        tasks = []
+        with sqlite3.connect(self.db_path) as conn:
+            for filepath in files:
+                try:
+                    file_stat = self._file_stat(filepath)
+                except FileNotFoundError:
+                    continue  # removed since it was listed
                 row = conn.execute(
-                    "SELECT hash FROM documents WHERE id = ?", (doc_id,)
+                    "SELECT hash, stat FROM documents WHERE id = ?", (self._doc_id(filepath),)
                 ).fetchone()
-                if row and row[0] == file_hash:
-                    logger.info(f"Skipping {filepath} (unchanged)")
+                if row and row[1] == file_stat:
+                    logger.debug(f"Skipping {filepath} (unchanged)")
                     continue
+                stats[filepath] = file_stat
+                # Stat changed: the worker hashes it and parses only if the content did
+                tasks.append((filepath, row[0] if row else None))
 
-            # Remove old data for this document
-            self._remove_document_data(doc_id)
-
-            chunks = self.loader.load(filepath)
-            if not chunks:
-                continue
+        if not tasks and not removed:
+            logger.info("No new chunks to index")
+            return
+        # Only now: a no-op change set must not read (or rebuild) the index
+        self._load_or_create_index()
+
+        stop = threading.Event()
+        batches: queue.Queue = queue.Queue(maxsize=PIPELINE_DEPTH)
+        stages = []
+        if tasks:
+            documents: queue.Queue = queue.Queue(maxsize=PIPELINE_DEPTH)
+            stages = [
+                threading.Thread(target=self._load_stage, args=(tasks, stats, documents, stop),
+                                 daemon=True, name="index-load"),
+                threading.Thread(target=self._embed_stage, args=(documents, batches, stop),
+                                 daemon=True, name="index-embed"),
+            ]
+        else:
+            batches.put(_END_OF_STREAM)  # removals only
+        for thread in stages:
+            thread.start()
+
+        try:
+            added = self._write_stage(batches, removed)
+        except BaseException:
+            # Vectors may already be in the in-memory index: reload it from disk next time
+            self.index = None
+            self._needs_rebuild = False
+            raise
+        finally:
+            stop.set()
+            for thread in stages:
+                thread.join()
+
+        if added is None:
+            return
+        self._commit_index()
+        if tasks:
+            logger.info(f"Indexed {added} new chunks")
+
+    def _load_stage(self, tasks: list, stats: dict, out: queue.Queue, stop: threading.Event):
+        """Parse documents (in the ingest pool) and pass them on one by one."""
+        try:
+            if self.ingest_pool is not None:
+                parsed = self.ingest_pool.parse(tasks)
+            else:
+                parsed = iter_parsed(self.loader, tasks,
+                                     workers=min(self.ingest_workers, len(tasks)))
+            for filepath, file_hash, chunks in parsed:
+                doc = (self._doc_id(filepath), filepath, file_hash, stats[filepath], chunks)
+                if not _put(out, doc, stop):
+                    return
+            _put(out, _END_OF_STREAM, stop)
+        except Exception as e:
+            _put(out, e, stop)
+
+    def _embed_stage(self, inp: queue.Queue, out: queue.Queue, stop: threading.Event):
+        """Embed chunks in fixed-size batches, forwarding document records in order.
+
+        Chunks whose content is already stored (or queued earlier in this
+        run) are passed on as references and not embedded again.
+        """
+        # (doc_id, chunk_index, text, content_hash, needs_embedding) in document order
+        pending = []
+        to_embed = 0
+        queued_hashes = set()
+        reused = 0
+        # Sees committed rows only; contents referenced here are not deleted
+        # before the writer commits (orphans are dropped at the very end)
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+
+        def flush() -> bool:
+            nonlocal to_embed
+            if not pending:
+                return True
+            texts = [text for _, _, text, _, new in pending if new]
+            if texts:
+                embeddings = self.embedder.embed_batched(texts, batch_size=32).astype(np.float32)
+            else:
+                embeddings = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+            batch = (list(pending), embeddings)
+            pending.clear()
+            to_embed = 0
+            return _put(out, batch, stop)
+
+        try:
+            while True:
+                item = _get(inp, stop)
+                if item is None:
+                    return
+                if item is _END_OF_STREAM or isinstance(item, Exception):
+                    if item is _END_OF_STREAM and not flush():
+                        return
+                    _put(out, item, stop)
+                    return
+                doc_id, _, _, _, chunks = item
+                # Forwarded ahead of its own chunks, so the writer replaces the
+                # document's rows before inserting the new ones
+                if not _put(out, item, stop):
+                    return
+                for i, text in enumerate(chunks or []):
+                    content_hash = chunk_hash(text)
+                    known = content_hash in queued_hashes or conn.execute(
+                        "SELECT 1 FROM chunks WHERE content_hash = ? LIMIT 1", (content_hash,)
+                    ).fetchone() is not None
+                    if known:
+                        reused += 1
+                    else:
+                        queued_hashes.add(content_hash)
+                        to_embed += 1
+                    pending.append((doc_id, i, text, content_hash, not known))
+                    if (to_embed >= EMBED_BATCH or len(pending) >= 4 * EMBED_BATCH) \
+                            and not flush():
+                        return
+        except Exception as e:
+            _put(out, e, stop)
+        finally:
+            conn.close()
+            self.embedder.release()
+            if reused:
+                logger.info(f"Reused {reused} already embedded chunks")
+
+    def _write_stage(self, inp: queue.Queue, removed: list[str] = ()):
+        """Apply removals, then documents and vector batches, in one SQLite transaction.
+
+        Returns the number of chunks added, or None if nothing changed.
+        """
+        added = 0
+        changed = False
+        unlinked = set()  # embedding_ids that lost a source document
+        content_ids = {}  # content_hash -> embedding_id written in this run
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for filepath in removed:
+                ids = self._remove_document_data(conn, self._doc_id(filepath))
+                unlinked.update(ids)
+                changed |= bool(ids)
+                logger.info(f"Removed document {filepath}")
+
+            next_id = _read_counter(conn, "next_embedding_id")
+
+            while True:
+                item = inp.get()
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                if len(item) == 2:
+                    # Batch of chunks: new contents with their vectors, and references
+                    rows, embeddings = item
+                    contents = []
+                    sources = []
+                    for doc_id, chunk_idx, text, content_hash, new in rows:
+                        if new:
+                            emb_id = next_id
+                            next_id += 1
+                            content_ids[content_hash] = emb_id
+                            contents.append((text, emb_id, embeddings[len(contents)].tobytes(),
+                                             content_hash))
+                        else:
+                            emb_id = content_ids.get(content_hash)
+                            if emb_id is None:
+                                row = conn.execute(
+                                    "SELECT embedding_id FROM chunks WHERE content_hash = ? "
+                                    "LIMIT 1", (content_hash,)
+                                ).fetchone()
+                                if row is None:
+                                    logger.warning(f"Chunk content vanished, skipping: {text[:40]}")
+                                    continue
+                                emb_id = content_ids[content_hash] = row[0]
+                        sources.append((doc_id, chunk_idx, emb_id))
+
+                    conn.executemany(
+                        "INSERT INTO chunks (text, embedding_id, embedding, content_hash) "
+                        "VALUES (?, ?, ?, ?)",
+                        contents,
+                    )
+                    conn.executemany(
+                        "INSERT INTO chunk_sources (document_id, chunk_index, embedding_id) "
+                        "VALUES (?, ?, ?)",
+                        sources,
+                    )
+                    if contents:
+                        # Append only the new vectors to the FAISS index
+                        ids = np.array([c[1] for c in contents], dtype=np.int64)
+                        self.index.add_with_ids(embeddings, ids)
+                    added += len(contents)
+                    changed |= bool(sources)
+                    continue
 
-            filename = os.path.basename(filepath)
-            ext = os.path.splitext(filename)[1].lower().lstrip(".")
+                doc_id, filepath, file_hash, file_stat, chunks = item
+                if chunks is None:
+                    conn.execute("UPDATE documents SET stat = ? WHERE id = ?", (file_stat, doc_id))
+                    logger.info(f"Skipping {filepath} (unchanged)")
+                    continue
 
-            with sqlite3.connect(self.db_path) as conn:
+                # Unlink the document's old chunks (contents still used are kept)
+                ids = self._remove_document_data(conn, doc_id)
+                unlinked.update(ids)
+                changed |= bool(ids)
+                if not chunks:
+                    continue
+                filename = os.path.basename(filepath)
+                ext = os.path.splitext(filename)[1].lower().lstrip(".")
                 conn.execute(
-                    "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    "INSERT INTO documents "
+                    "(id, filename, filepath, format, hash, indexed_at, chunk_count, stat) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
                     (doc_id, filename, filepath, ext, file_hash,
-                     datetime.now().isoformat(), len(chunks)),
+                     datetime.now().isoformat(), len(chunks), file_stat),
                 )
-                conn.commit()
 
-            for i, chunk_text in enumerate(chunks):
-                all_chunks.append(chunk_text)
-                chunk_metadata.append((doc_id, chunk_text, i))
-
-        if not all_chunks:
-            logger.info("No new chunks to index")
-            self._load_or_create_index()
-            return
-
-        # Compute embeddings
-        self.embedder.load()
-        batch_size = 32
-        all_embeddings = []
-        for i in range(0, len(all_chunks), batch_size):
-            batch = all_chunks[i : i + batch_size]
-            emb = self.embedder.embed(batch)
-            all_embeddings.append(emb)
-        embeddings = np.vstack(all_embeddings).astype(np.float32)
-        self.embedder.unload()
-
-        # Get current max embedding_id
+            removed_vectors = self._drop_orphans(conn, unlinked)
+            if removed_vectors:
+                logger.info(f"Dropped {removed_vectors} chunks no longer used by any document")
+            _write_counter(conn, "next_embedding_id", next_id)
+            if added or changed:
+                self._generation = db_generation(conn) + 1
+                _write_counter(conn, "generation", self._generation)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        return added if added or changed else None
+
+    def _embed_texts(self, texts: list[str]) -> np.ndarray:
+        """Embed texts in length-sorted batches. Returns [N, dim] float32 array."""
+        embeddings = self.embedder.embed_batched(texts, batch_size=32).astype(np.float32)
+        self.embedder.release()
+        return embeddings
+
+    def _backfill_embeddings(self):
+        """Embed and store vectors for chunks indexed before vectors were persisted."""
         with sqlite3.connect(self.db_path) as conn:
-            row = conn.execute("SELECT MAX(embedding_id) FROM chunks").fetchone()
-            start_id = (row[0] or -1) + 1
+            rows = conn.execute(
+                "SELECT id, text FROM chunks WHERE embedding IS NULL"
+            ).fetchall()
+        if not rows:
+            return
 
-        # Store chunks in SQLite
+        logger.info(f"Backfilling stored embeddings for {len(rows)} chunks")
+        embeddings = self._embed_texts([r[1] for r in rows])
         with sqlite3.connect(self.db_path) as conn:
-            for idx, (doc_id, text, chunk_idx) in enumerate(chunk_metadata):
-                embedding_id = start_id + idx
-                conn.execute(
-                    "INSERT INTO chunks (document_id, text, chunk_index, embedding_id) VALUES (?, ?, ?, ?)",
-                    (doc_id, text, chunk_idx, embedding_id),
-                )
+            conn.executemany(
+                "UPDATE chunks SET embedding = ? WHERE id = ?",
+                [(emb.tobytes(), r[0]) for r, emb in zip(rows, embeddings)],
+            )
             conn.commit()
 
-        # Build/update FAISS index
-        self._rebuild_full_index()
-
-        logger.info(f"Indexed {len(all_chunks)} new chunks")
+    def _new_index(self, train_vectors: np.ndarray = None) -> faiss.Index:
+        """Empty index whose search results are embedding_ids, not row positions."""
+        return faiss_index.create_index(
+            self.index_type, EMBEDDING_DIM, self.index_params, train_vectors=train_vectors
+        )
 
     def _rebuild_full_index(self):
-        """Rebuild FAISS index from all embeddings in DB."""
+        """Rebuild FAISS index from the vectors stored in DB (no re-embedding)."""
+        self._backfill_embeddings()
+
         with sqlite3.connect(self.db_path) as conn:
             rows = conn.execute(
-                "SELECT embedding_id, text FROM chunks ORDER BY embedding_id"
+                "SELECT embedding_id, embedding FROM chunks ORDER BY embedding_id"
             ).fetchall()
+            self._generation = db_generation(conn)
 
         if not rows:
-            self.index = faiss.IndexFlatIP(312)
-            self._save_index()
-            return
-
-        texts = [r[1] for r in rows]
-
-        self.embedder.load()
-        batch_size = 32
-        all_embeddings = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            emb = self.embedder.embed(batch)
-            all_embeddings.append(emb)
-        embeddings = np.vstack(all_embeddings).astype(np.float32)
-        self.embedder.unload()
-
-        self.index = faiss.IndexFlatIP(embeddings.shape[1])
-        self.index.add(embeddings)
+            self.index = self._new_index()
+        else:
+            ids = np.array([r[0] for r in rows], dtype=np.int64)
+            embeddings = np.vstack(
+                [np.frombuffer(r[1], dtype=np.float32) for r in rows]
+            )
+            # Trainable index types (IVF-PQ) are trained on the stored vectors
+            self.index = self._new_index(train_vectors=embeddings)
+            self.index.add_with_ids(embeddings, ids)
+        self._needs_rebuild = False
         self._save_index()
 
     def _load_or_create_index(self):
+        """Load the ID-mapped index, rebuilding it if missing, legacy, out of sync
+        or built as a different index type than configured.
+
+        In sync means saved at the DB's current generation: the DB commits
+        before the index file is replaced, so a crash in between leaves an
+        older generation on disk, whatever the vector count.
+        """
+        if self.index is not None:
+            return
+
         if os.path.exists(self.faiss_path):
-            self.index = faiss.read_index(self.faiss_path)
-        else:
-            self.index = faiss.IndexFlatIP(312)
+            index = faiss.read_index(self.faiss_path)
+            with sqlite3.connect(self.db_path) as conn:
+                generation = db_generation(conn)
+            meta = faiss_index.load_meta(self.faiss_path)
+            if (isinstance(index, faiss.IndexIDMap2) and meta.get("generation") == generation
+                    and meta.get("type", "flat") == self.index_type
+                    and not self._awaits_training(index)):
+                self.index = index
+                self._generation = generation
+                return
+            logger.info("FAISS index is not ID-mapped, out of sync, of another type "
+                        "or ready to train, rebuilding")
+
+        self._rebuild_full_index()
+
+    def _awaits_training(self, index: faiss.Index) -> bool:
+        """IVF-PQ configured, but still the flat fallback although it could be trained now."""
+        if self.index_type != "ivfpq":
+            return False
+        base = faiss.downcast_index(index.index)
+        return (not isinstance(base, faiss.IndexIVFPQ)
+                and faiss_index.ivfpq_nlist(index.ntotal, self.index_params) > 0)
 
     def _save_index(self):
         os.makedirs(os.path.dirname(self.faiss_path), exist_ok=True)
-        faiss.write_index(self.index, self.faiss_path)
+        faiss_index.write_index_atomic(self.index, self.faiss_path)
+        faiss_index.save_meta(self.faiss_path, self.index, self.index_type, self.index_params,
+                              generation=self._generation)
+
+    def _commit_index(self):
+        """Persist incremental changes, or rebuild if the index could not apply them
+        or IVF-PQ can now be trained."""
+        if self._needs_rebuild or self._awaits_training(self.index):
+            self._rebuild_full_index()
+        else:
+            self._save_index()
+
+    def _remove_document_data(self, conn: sqlite3.Connection, doc_id: str) -> set[int]:
+        """Delete a document and its chunk links (uncommitted, in conn).
+
+        Returns the embedding_ids it referenced; contents no other document
+        uses are dropped later by _drop_orphans.
+        """
+        ids = {
+            r[0] for r in conn.execute(
+                "SELECT embedding_id FROM chunk_sources WHERE document_id = ?", (doc_id,)
+            )
+        }
+        conn.execute("DELETE FROM chunk_sources WHERE document_id = ?", (doc_id,))
+        conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+        return ids
+
+    def _drop_orphans(self, conn: sqlite3.Connection, candidates: set[int]) -> int:
+        """Delete contents among candidates with no source left, and their vectors."""
+        ids = [
+            i for i in sorted(candidates)
+            if conn.execute(
+                "SELECT 1 FROM chunk_sources WHERE embedding_id = ? LIMIT 1", (i,)
+            ).fetchone() is None
+        ]
+        conn.executemany("DELETE FROM chunks WHERE embedding_id = ?", [(i,) for i in ids])
+
+        if ids and self.index is not None:
+            try:
+                self.index.remove_ids(np.array(ids, dtype=np.int64))
+            except RuntimeError:
+                # HNSW graphs do not support removal: rebuild from stored vectors
+                self._needs_rebuild = True
+        return len(ids)
+
+    def compact(self):
+        """Rebuild (and retrain) the index from stored vectors.
+
+        Reclaims space after many removals and lets IVF-PQ retrain once the
+        corpus has grown. Duplicate chunks left from databases indexed before
+        deduplication are merged first.
+        """
+        self._merge_duplicate_chunks()
+        self._rebuild_full_index()
+        logger.info(f"Compacted FAISS index: {self.index.ntotal} vectors")
 
-    def _remove_document_data(self, doc_id: str):
+    def _merge_duplicate_chunks(self):
+        """Point every document at one copy of each chunk content and delete the rest."""
         with sqlite3.connect(self.db_path) as conn:
-            conn.execute("DELETE FROM chunks WHERE document_id = ?", (doc_id,))
-            conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+            groups = conn.execute(
+                "SELECT content_hash, MIN(embedding_id) FROM chunks "
+                "GROUP BY content_hash HAVING COUNT(*) > 1"
+            ).fetchall()
+            for content_hash, keep_id in groups:
+                conn.execute(
+                    "UPDATE chunk_sources SET embedding_id = ? WHERE embedding_id IN "
+                    "(SELECT embedding_id FROM chunks WHERE content_hash = ?)",
+                    (keep_id, content_hash),
+                )
+                conn.execute(
+                    "DELETE FROM chunks WHERE content_hash = ? AND embedding_id != ?",
+                    (content_hash, keep_id),
+                )
+            if groups:
+                _write_counter(conn, "generation", db_generation(conn) + 1)
             conn.commit()
+        if groups:
+            logger.info(f"Merged duplicate chunks into {len(groups)} shared contents")
 
     def add_document(self, filepath: str):
         """Index a single document (incremental)."""
-        self.index_directory(os.path.dirname(filepath))
+        self.index_files([filepath])
 
     def remove_document(self, filepath: str):
-        """Remove a document and rebuild index."""
-        doc_id = self._doc_id(filepath)
-        self._remove_document_data(doc_id)
-        self._rebuild_full_index()
-        logger.info(f"Removed document {filepath}")
-
-
-def main():
-    """CLI entry point: python -m src.rag.indexer"""
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
-    config = load_config()
-    rag_cfg = config["rag"]
-
-    loader = DocumentLoader(
-        chunk_size=rag_cfg.get("chunk_size", 400),
-        chunk_overlap=rag_cfg.get("chunk_overlap", 50),
-    )
-    embedder = Embedder(rag_cfg["embedder"]["model_path"])
-    indexer = Indexer(
-        faiss_path=rag_cfg["index"]["faiss_path"],
-        db_path=rag_cfg["index"]["db_path"],
-        embedder=embedder,
-        loader=loader,
-    )
-    indexer.index_directory(rag_cfg["documents_path"])
-    logger.info("Indexing complete.")
-
-
-if __name__ == "__main__":
-    main()
+        """Remove a document's vectors from the index (incremental)."""
+        self.apply_changes(removed=[filepath])
+
@@ -0,0 +1,199 @@
+"""Parallel ingest: hash, parse and chunk documents in a bounded process pool."""
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from src.rag.document_loader import DocumentLoader
+
+logger = logging.getLogger(__name__)
+
+_loader: DocumentLoader = None  # set in each worker process
+
+
+class ParsedDocument(NamedTuple):
+    filepath: str
+    file_hash: str
+    chunks: Optional[list[str]]  # None when the content hash matched known_hash
+
+
+def file_hash(filepath: str) -> str:
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(8192), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def parse_document(loader: DocumentLoader, filepath: str,
+                   known_hash: str = None) -> ParsedDocument:
+    """Hash a file and, unless its content is known_hash, load and chunk it."""
+    digest = file_hash(filepath)
+    if digest == known_hash:
+        return ParsedDocument(filepath, digest, None)
+    return ParsedDocument(filepath, digest, loader.load(filepath))
+
+
+def _init_worker(loader: DocumentLoader):
+    global _loader
+    _loader = loader
+
+
+def _parse_in_worker(filepath: str, known_hash: str) -> ParsedDocument:
+    return parse_document(_loader, filepath, known_hash)
+
+
+def default_workers(background: bool = False) -> int:
+    """All cores for the indexer CLI; half of them next to the live assistant."""
+    cores = os.cpu_count() or 1
+    return max(1, cores // 2 if background else cores)
+
+
+class IngestPool:
+    """Process pool that parses documents for successive change sets.
+
+    Workers start on first use and are reused by later calls instead of a
+    new pool per watcher tick; after idle_timeout seconds without work they
+    exit and give their memory back (None keeps them until shutdown()).
+    """
+
+    def __init__(self, loader: DocumentLoader, workers: int = None,
+                 idle_timeout: float = 300.0):
+        self.loader = loader
+        self.workers = workers or default_workers()
+        self.idle_timeout = idle_timeout
+        self._executor = None
+        self._busy = 0
+        self._idle_timer = None
+        self._lock = threading.Lock()
+
+    def parse(self, tasks: Iterable[tuple[str, str]],
+              max_in_flight: int = None) -> Iterator[ParsedDocument]:
+        """Parse (filepath, known_hash) tasks, yielding results as they finish.
+
+        With more than one worker the files are parsed in worker processes
+        (PDF text extraction is CPU-bound and holds the GIL). At most
+        max_in_flight documents are submitted or waiting to be consumed,
+        which bounds the memory taken by parsed text. Results arrive in
+        completion order.
+        """
+        if self.workers <= 1:
+            yield from _parse_inline(self.loader, tasks)
+            return
+
+        executor = self._acquire()
+        try:
+            yield from _parse_in_pool(executor, tasks, max_in_flight or self.workers * 2)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed): start a fresh pool next time
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+        finally:
+            self._release()
+
+    def _acquire(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            self._busy += 1
+            if self._executor is None:
+                # forkserver: workers do not inherit the parent's threads and
+                # loaded models (they re-import only the small entry module: src.main,
+                # src.index)
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context(
+                    "forkserver" if "forkserver" in methods else "spawn"
+                )
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context,
+                    initializer=_init_worker, initargs=(self.loader,),
+                )
+            return self._executor
+
+    def _release(self):
+        with self._lock:
+            self._busy -= 1
+            if self._busy == 0 and self._executor is not None and self.idle_timeout is not None:
+                self._idle_timer = threading.Timer(self.idle_timeout, self._stop_idle)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+
+    def _stop_idle(self):
+        with self._lock:
+            if self._busy:
+                return
+            executor, self._executor = self._executor, None
+            self._idle_timer = None
+        if executor is not None:
+            executor.shutdown()
+            logger.info("Ingest workers idle, stopped")
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def _parse_inline(loader: DocumentLoader,
+                  tasks: Iterable[tuple[str, str]]) -> Iterator[ParsedDocument]:
+    for filepath, known_hash in tasks:
+        try:
+            result = parse_document(loader, filepath, known_hash)
+        except Exception as e:
+            logger.error(f"Error parsing {filepath}: {e}")
+            continue
+        yield result
+
+
+def _parse_in_pool(executor: ProcessPoolExecutor, tasks: Iterable[tuple[str, str]],
+                   max_in_flight: int) -> Iterator[ParsedDocument]:
+    tasks = iter(tasks)
+    pending = {}
+    try:
+        for filepath, known_hash in tasks:
+            pending[executor.submit(_parse_in_worker, filepath, known_hash)] = filepath
+            if len(pending) >= max_in_flight:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                filepath = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error parsing {filepath}: {e}")
+                    continue
+                # Refill before yielding so workers stay busy while the caller embeds
+                for next_path, next_hash in tasks:
+                    pending[executor.submit(_parse_in_worker, next_path, next_hash)] = next_path
+                    break
+                yield result
+    finally:
+        # The caller stopped early: do not parse the rest
+        for future in pending:
+            future.cancel()
+
+
+def iter_parsed(loader: DocumentLoader, tasks: Iterable[tuple[str, str]],
+                workers: int = None, max_in_flight: int = None) -> Iterator[ParsedDocument]:
+    """Parse tasks in a pool that lives only for this call (see IngestPool.parse)."""
+    pool = IngestPool(loader, workers, idle_timeout=None)
+    try:
+        yield from pool.parse(tasks, max_in_flight)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,80 @@
+"""Minimal Linux inotify binding over ctypes (no third-party dependency)."""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Event masks from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class Inotify:
+    """Non-blocking inotify descriptor with wait()/read() helpers.
+
+    Raises OSError on construction when inotify is unavailable (non-Linux,
+    no libc, or the per-user instance limit is reached).
+    """
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        try:
+            self._libc = ctypes.CDLL(libc_name, use_errno=True)
+            init1 = self._libc.inotify_init1
+        except (OSError, AttributeError) as e:
+            raise OSError(f"inotify is not available: {e}") from e
+        # IN_NONBLOCK / IN_CLOEXEC share their values with O_NONBLOCK / O_CLOEXEC
+        self.fd = init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_init1: {os.strerror(errno)}")
+
+    def add_watch(self, path: str, mask: int) -> int:
+        """Watch path for mask events; returns the watch descriptor."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch({path}): {os.strerror(errno)}")
+        return wd
+
+    def wait(self, timeout: float) -> bool:
+        """Block up to timeout seconds for events; True if some are ready."""
+        ready, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        return bool(ready)
+
+    def read(self) -> list[tuple[int, int, str]]:
+        """Pending events as (wd, mask, name); name is "" for the watched path itself."""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -0,0 +1,151 @@
+"""Persistent LLM worker: one thread owns the Llama instance and serves prompts."""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Iterator
+
+from src.utils.memory import force_gc, log_memory_usage
+
+logger = logging.getLogger(__name__)
+
+_END_OF_STREAM = object()
+
+
+class LLMWorker:
+    """Long-lived thread that owns a llama_cpp.Llama and serves prompts from a queue.
+
+    The GGUF file is memory-mapped once and the context is kept between
+    requests. After idle_timeout seconds without prompts the worker frees the
+    model and exits, calling on_idle so the owner can account for it.
+    """
+
+    def __init__(self, model_path: str, context_size: int = 512, n_threads: int = 4,
+                 idle_timeout: float = 300.0, on_idle: Callable[[], None] = None):
+        self.model_path = model_path
+        self.context_size = context_size
+        self.n_threads = n_threads
+        self.idle_timeout = idle_timeout
+        self.on_idle = on_idle
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._ready = threading.Event()
+        self._load_error = None
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stopped
+
+    def start(self):
+        """Start the worker and block until the model is loaded."""
+        self._thread = threading.Thread(target=self._run, daemon=True, name="llm-worker")
+        self._thread.start()
+        self._ready.wait()
+        if self._load_error is not None:
+            raise self._load_error
+
+    def submit(self, prompt: str, **kwargs) -> dict:
+        """Run a completion on the worker thread and return llama-cpp output."""
+        future: Future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("LLM worker is stopped")
+            self._queue.put((prompt, kwargs, future))
+        return future.result()
+
+    def submit_stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Run a streaming completion on the worker thread, yielding text pieces."""
+        tokens: queue.Queue = queue.Queue()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("LLM worker is stopped")
+            self._queue.put((prompt, dict(kwargs, stream=True), tokens))
+        while True:
+            item = tokens.get()
+            if item is _END_OF_STREAM:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def stop(self):
+        """Ask the worker to free the model and exit."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(None)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=10.0)
+
+    def _run(self):
+        try:
+            log_memory_usage("before LLM load")
+            from llama_cpp import Llama
+            llm = Llama(
+                model_path=self.model_path,
+                n_ctx=self.context_size,
+                n_threads=self.n_threads,
+                use_mmap=True,
+                verbose=False,
+            )
+            log_memory_usage("after LLM load")
+            logger.info("LLM worker started")
+        except Exception as e:
+            self._load_error = e
+            self._stopped = True
+            self._ready.set()
+            return
+        self._ready.set()
+
+        idle = False
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                idle = True
+                break
+            if item is None:
+                break
+            prompt, kwargs, sink = item
+            if isinstance(sink, Future):
+                try:
+                    sink.set_result(llm(prompt, **kwargs))
+                except Exception as e:
+                    sink.set_exception(e)
+                continue
+            # Streaming request: forward pieces as they are decoded
+            try:
+                for output in llm(prompt, **kwargs):
+                    sink.put(output["choices"][0]["text"])
+                sink.put(_END_OF_STREAM)
+            except Exception as e:
+                sink.put(e)
+
+        with self._lock:
+            self._stopped = True
+        # Fail prompts that raced with shutdown instead of leaving callers blocked
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                continue
+            error = RuntimeError("LLM worker is stopped")
+            if isinstance(item[2], Future):
+                item[2].set_exception(error)
+            else:
+                item[2].put(error)
+
+        del llm
+        force_gc()
+        log_memory_usage("after LLM unload")
+        if idle:
+            logger.info(f"LLM worker idle for {self.idle_timeout:.0f}s, unloaded")
+            if self.on_idle:
+                self.on_idle()
+        else:
+            logger.info("LLM worker stopped")
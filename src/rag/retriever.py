@@ -1,23 +1,128 @@
 import logging
+import os
 import sqlite3
+import threading
 
-import faiss
 import numpy as np
 
+from src.rag.faiss_index import read_index_mmap, set_search_params
+from src.utils.tracing import tracer
+
 logger = logging.getLogger(__name__)
 
 
 class Retriever:
-    def __init__(self, faiss_path: str, db_path: str):
+    """FAISS + SQLite search that hot-swaps to a new index generation between queries."""
+
+    def __init__(self, faiss_path: str, db_path: str, cache_chunks: bool = False,
+                 ef_search: int = None, nprobe: int = None):
         self.faiss_path = faiss_path
         self.db_path = db_path
+        self.cache_chunks = cache_chunks
+        self.ef_search = ef_search
+        self.nprobe = nprobe
         self.index = None
+        self._generation = None  # stat of the loaded index file
+        self._reload_lock = threading.Lock()
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self._chunk_cache = None  # embedding_id -> (text, [filenames])
+        self._cache_generation = None
+
+    def _file_generation(self):
+        try:
+            st = os.stat(self.faiss_path)
+        except OSError:
+            return None
+        # The indexer renames a new file into place, so the inode changes too
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @property
+    def generation(self):
+        """Identity of the loaded index file; changes on every reindex."""
+        return self._generation
 
     def load_index(self):
-        """Load FAISS index from disk."""
-        self.index = faiss.read_index(self.faiss_path)
+        """Load FAISS index from disk (memory-mapped) and swap it in."""
+        generation = self._file_generation()
+        index = read_index_mmap(self.faiss_path)
+        set_search_params(index, ef_search=self.ef_search, nprobe=self.nprobe)
+        # Searches already running keep their reference to the previous index
+        self.index = index
+        self._generation = generation
         logger.info(f"FAISS index loaded: {self.index.ntotal} vectors")
 
+    def refresh(self) -> bool:
+        """Pick up a new index generation written by the indexer. Returns True if swapped."""
+        if self._file_generation() == self._generation:
+            return False
+        # Another thread is already loading it: keep serving the current index
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._file_generation() == self._generation:
+                return False
+            self.load_index()
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Long-lived read-only connection (the indexer keeps the DB in WAL mode)."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False
+            )
+        return self._conn
+
+    @staticmethod
+    def _group_rows(rows) -> dict[int, tuple[str, list[str]]]:
+        """(embedding_id, text, filename) rows -> {embedding_id: (text, [filenames])}."""
+        chunks = {}
+        for emb_id, text, filename in rows:
+            _, filenames = chunks.setdefault(emb_id, (text, []))
+            if filename not in filenames:
+                filenames.append(filename)
+        return chunks
+
+    def _fetch_chunks(self, ids: list[int]) -> dict[int, tuple[str, list[str]]]:
+        """Return {embedding_id: (text, [filenames])} for the given ids in one query.
+
+        A chunk shared by several documents (deduplicated) lists all of them.
+        """
+        with self._conn_lock:
+            conn = self._connection()
+
+            if self.cache_chunks:
+                if self._chunk_cache is None or self._cache_generation != self._generation:
+                    generation = self._generation
+                    rows = conn.execute(
+                        """
+                        SELECT c.embedding_id, c.text, d.filename
+                        FROM chunks c
+                        JOIN chunk_sources s ON s.embedding_id = c.embedding_id
+                        JOIN documents d ON s.document_id = d.id
+                        ORDER BY d.filename
+                        """
+                    ).fetchall()
+                    self._chunk_cache = self._group_rows(rows)
+                    self._cache_generation = generation
+                return {i: self._chunk_cache[i] for i in ids if i in self._chunk_cache}
+
+            placeholders = ",".join("?" * len(ids))
+            rows = conn.execute(
+                f"""
+                SELECT c.embedding_id, c.text, d.filename
+                FROM chunks c
+                JOIN chunk_sources s ON s.embedding_id = c.embedding_id
+                JOIN documents d ON s.document_id = d.id
+                WHERE c.embedding_id IN ({placeholders})
+                ORDER BY d.filename
+                """,
+                ids,
+            ).fetchall()
+        return self._group_rows(rows)
+
     def search(self, query_embedding: np.ndarray, top_k: int = 3) -> list[dict]:
         """Search for most relevant chunks.
 
@@ -26,42 +131,49 @@ class Retriever:
             top_k: number of results
 
         Returns:
-            List of {text, score, document_name}
+            List of {text, score, document_name, document_names}
         """
         if self.index is None:
             self.load_index()
+        else:
+            self.refresh()
+        index = self.index
 
-        if self.index.ntotal == 0:
+        if index.ntotal == 0:
             return []
 
         if query_embedding.ndim == 1:
             query_embedding = query_embedding.reshape(1, -1)
 
         query_embedding = query_embedding.astype(np.float32)
-        top_k = min(top_k, self.index.ntotal)
+        top_k = min(top_k, index.ntotal)
+
+        with tracer.stage("faiss_search"):
+            scores, indices = index.search(query_embedding, top_k)
 
-        scores, indices = self.index.search(query_embedding, top_k)
+        hits = [(float(score), int(idx)) for score, idx in zip(scores[0], indices[0]) if idx >= 0]
+        if not hits:
+            return []
+        with tracer.stage("sqlite_fetch"):
+            chunks = self._fetch_chunks([idx for _, idx in hits])
 
         results = []
-        with sqlite3.connect(self.db_path) as conn:
-            for score, idx in zip(scores[0], indices[0]):
-                if idx < 0:
-                    continue
-                row = conn.execute(
-                    """
-                    SELECT c.text, d.filename
-                    FROM chunks c
-                    JOIN documents d ON c.document_id = d.id
-                    WHERE c.embedding_id = ?
-                    """,
-                    (int(idx),),
-                ).fetchone()
-                if row:
-                    results.append({
-                        "text": row[0],
-                        "score": float(score),
-                        "document_name": row[1],
-                    })
+        for score, idx in hits:
+            row = chunks.get(idx)
+            if row:
+                results.append({
+                    "text": row[0],
+                    "score": score,
+                    "document_name": row[1][0],
+                    "document_names": row[1],
+                })
 
         logger.info(f"Found {len(results)} relevant chunks")
         return results
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
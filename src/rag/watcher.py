@@ -1,45 +1,157 @@
 """Document watcher: monitors documents folder for changes and triggers reindexing."""
-import hashlib
 import logging
 import os
 import threading
 import time
 from typing import Callable
 
+from src.rag import inotify
+
 logger = logging.getLogger(__name__)
 
+# Events meaning a file was fully written, moved or removed (not IN_MODIFY:
+# a file being copied fires it for every block). IN_CREATE is only acted on
+# for new subdirectories, which need watches of their own.
+WATCH_MASK = (
+    inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO | inotify.IN_MOVED_FROM
+    | inotify.IN_DELETE | inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF
+    | inotify.IN_CREATE
+)
+
 
 class DocumentWatcher:
-    """Polls a directory for document changes and triggers reindexing."""
+    """Watches a directory tree for document changes and reindexes exactly those files.
+
+    Uses inotify when available and falls back to polling. Either way a
+    change is confirmed by a scan that compares (mtime, size, inode) only;
+    files whose stat changed are handed to the indexer, which hashes them
+    once and skips those whose content is unchanged. Bursts of events are
+    debounced: the scan runs once no event has arrived for debounce seconds.
+    """
 
     def __init__(self, documents_path: str, indexer_factory: Callable,
-                 poll_interval: int = 60):
+                 poll_interval: int = 60, on_reindexed: Callable[[], None] = None,
+                 debounce: float = 2.0, use_inotify: bool = True, max_delay: float = 30.0):
         self.documents_path = documents_path
         self.indexer_factory = indexer_factory
+        self.on_reindexed = on_reindexed
         self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_delay = max_delay  # reindex even if events keep arriving
+        self.use_inotify = use_inotify
         self._running = False
+        self._stop_event = threading.Event()
         self._thread = None
-        self._known_files: dict[str, str] = {}  # filepath -> hash
+        # filepath -> (mtime_ns, size, inode)
+        self._known_files: dict[str, tuple[int, int, int]] = {}
         self._supported_exts = {".txt", ".pdf", ".docx"}
 
     def start(self):
         """Start watching in a background thread."""
         self._running = True
-        # Build initial snapshot
+        self._stop_event.clear()
+        # Initial snapshot (stat only: no file is read at startup)
         self._known_files = self._scan_files()
-        self._thread = threading.Thread(target=self._poll_loop, daemon=True)
+
+        notifier = self._open_inotify() if self.use_inotify else None
+        if notifier is not None:
+            self._thread = threading.Thread(target=self._inotify_loop, args=(notifier,),
+                                            daemon=True)
+            logger.info(f"Document watcher started (inotify, debounce {self.debounce}s)")
+        else:
+            self._thread = threading.Thread(target=self._poll_loop, daemon=True)
+            logger.info(f"Document watcher started (polling every {self.poll_interval}s)")
         self._thread.start()
-        logger.info(f"Document watcher started (polling every {self.poll_interval}s)")
+
+    def _open_inotify(self):
+        try:
+            notifier = inotify.Inotify()
+        except OSError as e:
+            logger.info(f"inotify unavailable ({e}), falling back to polling")
+            return None
+        try:
+            notifier.add_watch(self.documents_path, WATCH_MASK)
+        except OSError as e:
+            logger.info(f"Cannot watch {self.documents_path} ({e}), falling back to polling")
+            notifier.close()
+            return None
+        self._watch_subdirs(notifier, self.documents_path)
+        return notifier
+
+    def _watch_subdirs(self, notifier: inotify.Inotify, top: str):
+        """Add watches for every subdirectory below top (inotify is not recursive)."""
+        for root, dirs, _ in os.walk(top):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in dirs:
+                path = os.path.join(root, name)
+                try:
+                    notifier.add_watch(path, WATCH_MASK)
+                except OSError as e:
+                    # e.g. max_user_watches reached: the periodic rescan still covers it
+                    logger.warning(f"Cannot watch {path}: {e}")
 
     def _poll_loop(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self._safe_check()
+
+    def _inotify_loop(self, notifier: inotify.Inotify):
+        try:
+            while self._running:
+                # The periodic scan is a safety net for missed events (it only stats)
+                if not self._wait(notifier, self.poll_interval):
+                    if self._running:
+                        self._safe_check()
+                    continue
+
+                relevant = self._handle_events(notifier)
+                # Debounce: wait for quiet, e.g. until a 50-file copy is finished
+                deadline = time.monotonic() + self.max_delay
+                while self._running and self._wait(
+                    notifier, min(self.debounce, deadline - time.monotonic())
+                ):
+                    relevant = self._handle_events(notifier) or relevant
+
+                if relevant and self._running:
+                    self._safe_check()
+        finally:
+            notifier.close()
+
+    def _wait(self, notifier: inotify.Inotify, timeout: float) -> bool:
+        """Wait for inotify events in short slices so stop() is not delayed."""
+        deadline = time.monotonic() + timeout
         while self._running:
-            time.sleep(self.poll_interval)
-            if not self._running:
-                break
-            try:
-                self._check_for_changes()
-            except Exception as e:
-                logger.error(f"Document watcher error: {e}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if notifier.wait(min(remaining, 1.0)):
+                return True
+        return False
+
+    def _handle_events(self, notifier: inotify.Inotify) -> bool:
+        """Read pending events, watch new subdirectories; True if documents may have changed."""
+        relevant = False
+        new_dir = False
+        for _, mask, name in notifier.read():
+            if mask & (inotify.IN_Q_OVERFLOW | inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF):
+                relevant = True
+            elif mask & inotify.IN_ISDIR:
+                # A directory appeared, vanished or was moved: it may hold documents
+                relevant = True
+                new_dir |= bool(mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO))
+            elif mask & inotify.IN_CREATE:
+                continue  # a new file counts once it is closed after writing
+            elif os.path.splitext(name)[1].lower() in self._supported_exts:
+                relevant = True
+        if new_dir:
+            # Event names are relative to their watch, so re-walk the whole tree
+            self._watch_subdirs(notifier, self.documents_path)
+        return relevant
+
+    def _safe_check(self):
+        try:
+            self._check_for_changes()
+        except Exception as e:
+            logger.error(f"Document watcher error: {e}")
 
     def _check_for_changes(self):
         current_files = self._scan_files()
@@ -59,39 +171,36 @@ class DocumentWatcher:
             f"{len(removed)} removed, {len(changed)} modified"
         )
 
+        # One transaction and one new index generation for the whole tick; the
+        # indexer hashes stat-changed files and skips those with the same content
         indexer = self.indexer_factory()
-
-        for filepath in removed:
-            indexer.remove_document(filepath)
-
-        if added or changed:
-            indexer.index_directory(self.documents_path)
+        indexer.apply_changes(added=sorted(added), changed=sorted(changed),
+                              removed=sorted(removed))
 
         self._known_files = current_files
 
-    def _scan_files(self) -> dict[str, str]:
-        """Scan directory and return {filepath: hash} mapping."""
+        if self.on_reindexed:
+            self.on_reindexed()
+
+    def _scan_files(self) -> dict[str, tuple[int, int, int]]:
+        """Scan the directory tree and return {filepath: (mtime_ns, size, inode)}."""
         files = {}
-        if not os.path.isdir(self.documents_path):
-            return files
-        for name in os.listdir(self.documents_path):
-            ext = os.path.splitext(name)[1].lower()
-            if ext not in self._supported_exts:
-                continue
-            filepath = os.path.join(self.documents_path, name)
-            if os.path.isfile(filepath):
-                files[filepath] = self._file_hash(filepath)
+        for root, dirs, names in os.walk(self.documents_path):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in names:
+                if os.path.splitext(name)[1].lower() not in self._supported_exts:
+                    continue
+                filepath = os.path.join(root, name)
+                try:
+                    st = os.stat(filepath)
+                except FileNotFoundError:
+                    continue  # deleted while scanning
+                files[filepath] = (st.st_mtime_ns, st.st_size, st.st_ino)
         return files
 
-    def _file_hash(self, filepath: str) -> str:
-        h = hashlib.sha256()
-        with open(filepath, "rb") as f:
-            for block in iter(lambda: f.read(8192), b""):
-                h.update(block)
-        return h.hexdigest()
-
     def stop(self):
         self._running = False
+        self._stop_event.set()
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=5.0)
         logger.info("Document watcher stopped")
@@ -0,0 +1,90 @@
+"""On-disk LRU cache of synthesized speech, stored as memory-mappable raw PCM."""
+import hashlib
+import logging
+import os
+import threading
+import unicodedata
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Cache key form of an utterance: NFC, collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class AudioCache:
+    """Size-bounded LRU of int16 PCM files keyed by (voice id, normalized text).
+
+    Each entry is a headerless .pcm file that is returned as a read-only
+    np.memmap, so a hit costs no decoding and starts playing immediately.
+    Recency is the file mtime, bumped on every hit.
+    """
+
+    def __init__(self, cache_dir: str, voice_id: str, max_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.voice_id = voice_id
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = 0
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(".pcm"):
+                self._total_bytes += entry.stat().st_size
+            elif entry.name.endswith(".pcm.tmp"):
+                # Left by a crash or power loss before the rename in put()
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def _path(self, text: str) -> str:
+        key = hashlib.sha256(
+            f"{self.voice_id}\0{normalize_text(text)}".encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.pcm")
+
+    def get(self, text: str):
+        """Cached audio for text as a read-only int16 array, or None."""
+        path = self._path(text)
+        try:
+            audio = np.memmap(path, dtype=np.int16, mode="r")
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return audio
+
+    def __contains__(self, text: str) -> bool:
+        return os.path.exists(self._path(text))
+
+    def put(self, text: str, audio: np.ndarray):
+        """Store audio for text, evicting least recently used entries over max_bytes."""
+        if len(audio) == 0:
+            return
+        path = self._path(text)
+        tmp_path = path + ".tmp"
+        audio.astype(np.int16).tofile(tmp_path)
+        with self._lock:
+            existing = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._total_bytes += os.path.getsize(path) - existing
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(
+            (e for e in os.scandir(self.cache_dir) if e.name.endswith(".pcm")),
+            key=lambda e: e.stat().st_mtime,
+        )
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._total_bytes -= size
+        logger.info(f"TTS cache trimmed to {self._total_bytes // (1024 * 1024)} MB")
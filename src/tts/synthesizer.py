@@ -1,52 +1,233 @@
-import io
+import hashlib
+import json
 import logging
-import wave
+import os
+import queue
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator, Union
+
 import numpy as np
+from src.tts.cache import AudioCache
+from src.utils.memory import ModelResidency, ResidentModel, force_gc
+from src.utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+# A terminator followed by whitespace and the first character of the next
+# token (a candidate boundary), or a line break (always a boundary)
+_BOUNDARY = re.compile(r"([.!?…]+)\s+(?=(\S))|\n+")
+
+# Words that end with a dot without ending the sentence ("ул. Ленина", "каб. 5")
+ABBREVIATIONS = frozenset({
+    "ул", "пр", "просп", "пер", "пл", "наб", "д", "корп", "стр", "кв", "каб", "ауд",
+    "эт", "г", "гг", "в", "вв", "им", "проф", "доц", "акад", "зав", "зам", "преп",
+    "ст", "канд", "докт", "тел", "руб", "коп", "тыс", "млн", "млрд", "мин", "сек",
+    "см", "рис", "табл", "др", "т", "е", "с", "п", "н", "ок", "напр",
+})
+
+_SENTENCE_START = "«\"„(—–-"
+
+
+def _is_abbreviation(text: str) -> bool:
+    """True if text ends with an abbreviation or an initial (the dot follows it)."""
+    words = text.split()
+    if not words:
+        return False
+    word = words[-1].lstrip(_SENTENCE_START).lower()
+    # "т.е", "т.к" and initials ("А. С. Пушкин") are never sentence ends
+    return "." in word or (len(word) == 1 and word.isalpha()) or word in ABBREVIATIONS
+
+
+def _split_complete(text: str) -> tuple[list[str], str]:
+    """Split off the sentences whose end is certain; return them and the rest.
+
+    A sentence ends at a line break, or at . ! ? … followed by whitespace and
+    an uppercase letter (or opening quote/dash) when the word before a dot
+    is not an abbreviation. A terminator at the very end is undecided until
+    the next token arrives, so it stays in the rest.
+    """
+    sentences = []
+    start = 0
+    for m in _BOUNDARY.finditer(text):
+        end = m.start()
+        if m.group(1) is not None:
+            next_char = m.group(2)
+            if not (next_char.isupper() or next_char in _SENTENCE_START):
+                continue
+            if m.group(1) == "." and _is_abbreviation(text[start:end]):
+                continue
+            end += len(m.group(1))
+        sentence = text[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = m.end()
+    return sentences, text[start:]
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split text into sentences for incremental synthesis."""
+    sentences, rest = _split_complete(text)
+    if rest.strip():
+        sentences.append(rest.strip())
+    return sentences
 
-class Synthesizer:
+
+def iter_sentences(pieces: Iterable[str]) -> Iterator[str]:
+    """Yield complete sentences as soon as streamed text pieces close them."""
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        # The rest may still be growing
+        sentences, buffer = _split_complete(buffer)
+        yield from sentences
+    if buffer.strip():
+        yield buffer.strip()
+
+
+class Synthesizer(ResidentModel):
     """Text-to-speech using Piper TTS."""
 
-    def __init__(self, model_path: str, sample_rate: int = 22050):
+    residency_name = "tts"
+
+    def __init__(self, model_path: str, sample_rate: int = 22050,
+                 residency: ModelResidency = None, cache_path: str = None,
+                 cache_max_mb: int = 200):
         self.model_path = model_path
         self.sample_rate = sample_rate
+        self._residency = residency
         self._voice = None
+        # Single worker: Piper runs one sentence at a time, ahead of playback
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self._cache = self._open_cache(cache_path, cache_max_mb) if cache_path else None
 
-    def load(self):
-        """Load Piper voice model."""
-        from piper import PiperVoice
-        logger.info(f"Loading Piper TTS from {self.model_path}...")
-
+    def _voice_file(self) -> str:
         # model_path should point to the directory containing the .onnx file
-        import os
         onnx_files = [f for f in os.listdir(self.model_path) if f.endswith(".onnx")]
         if not onnx_files:
             raise FileNotFoundError(f"No .onnx file found in {self.model_path}")
+        return os.path.join(self.model_path, onnx_files[0])
+
+    def _open_cache(self, cache_path: str, cache_max_mb: int):
+        """Audio cache keyed by a fingerprint of the voice (config + model file)."""
+        try:
+            onnx_path = self._voice_file()
+            with open(onnx_path + ".json", "rb") as f:
+                voice_config = f.read()
+            st = os.stat(onnx_path)
+        except OSError as e:
+            logger.warning(f"TTS cache disabled: {e}")
+            return None
 
-        onnx_path = os.path.join(self.model_path, onnx_files[0])
-        self._voice = PiperVoice.load(onnx_path)
+        h = hashlib.sha256(voice_config)
+        h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+        # Cached audio may play before the voice is loaded
+        self.sample_rate = json.loads(voice_config).get("audio", {}).get(
+            "sample_rate", self.sample_rate
+        )
+        return AudioCache(cache_path, voice_id=h.hexdigest(),
+                          max_bytes=cache_max_mb * 1024 * 1024)
+
+    def load(self):
+        """Load Piper voice model."""
+        from piper import PiperVoice
+        logger.info(f"Loading Piper TTS from {self.model_path}...")
+
+        self._voice = PiperVoice.load(self._voice_file())
+        self.sample_rate = self._voice.config.sample_rate
         logger.info("Piper TTS loaded.")
 
+    def unload(self):
+        """Free Piper voice from RAM."""
+        self._voice = None
+        force_gc()
+        logger.info("Piper TTS unloaded.")
+
+    def preload(self):
+        """Load the voice ahead of the first utterance."""
+        with self._in_use():
+            pass
+
+    def is_loaded(self) -> bool:
+        return self._voice is not None
+
     def synthesize(self, text: str) -> np.ndarray:
         """Convert text to audio array (int16)."""
-        if self._voice is None:
-            self.load()
-
         if not text.strip():
             return np.array([], dtype=np.int16)
 
-        # Piper synthesize_to_raw returns raw PCM bytes
-        audio_buffer = io.BytesIO()
-        with wave.open(audio_buffer, "wb") as wav_file:
-            self._voice.synthesize(text, wav_file)
+        if self._cache is not None:
+            cached = self._cache.get(text)
+            if cached is not None:
+                return cached
+        return self._synthesize_uncached(text)
+
+    def prerender(self, texts: Iterable[str]):
+        """Synthesize fixed phrases into the cache ahead of time."""
+        if self._cache is None:
+            return
+        for text in texts:
+            for sentence in split_sentences(text):
+                if sentence not in self._cache:
+                    self._synthesize_uncached(sentence)
+
+    def synthesize_stream(self, text: Union[str, Iterable[str]]) -> Iterator[np.ndarray]:
+        """Yield int16 audio sentence by sentence.
+
+        `text` is a string or an iterable of text pieces still being generated
+        (e.g. LLM tokens). Sentences are synthesized on the worker thread as
+        soon as they are complete, while the caller plays earlier ones, so the
+        first audio is ready after one sentence.
+        """
+        pieces = [text] if isinstance(text, str) else text
+        pending: queue.Queue = queue.Queue()
+
+        def submit_sentences():
+            try:
+                for sentence in iter_sentences(pieces):
+                    cached = self._cache.get(sentence) if self._cache is not None else None
+                    if cached is not None:
+                        # Cache hit: ready now, no need to wait for the voice
+                        future = Future()
+                        future.set_result(cached)
+                    else:
+                        future = self._executor.submit(self._synthesize_uncached, sentence)
+                    pending.put(future)
+            except Exception as e:
+                logger.error(f"Text stream for TTS failed: {e}")
+            finally:
+                pending.put(None)
 
-        audio_buffer.seek(0)
-        with wave.open(audio_buffer, "rb") as wav_file:
-            self.sample_rate = wav_file.getframerate()
-            audio_bytes = wav_file.readframes(wav_file.getnframes())
+        threading.Thread(target=submit_sentences, daemon=True).start()
+        while True:
+            future = pending.get()
+            if future is None:
+                return
+            yield future.result()
 
-        audio = np.frombuffer(audio_bytes, dtype=np.int16)
+    def _synthesize_uncached(self, text: str) -> np.ndarray:
+        with self._in_use(), tracer.stage("synthesize"):
+            audio = self._synthesize_loaded(text)
+        if self._cache is not None:
+            self._cache.put(text, audio)
+        return audio
+
+    def _synthesize_loaded(self, text: str) -> np.ndarray:
+        chunks = list(self._pcm_chunks(text))
+        if not chunks:
+            return np.array([], dtype=np.int16)
+        audio = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
         logger.info(f"Synthesized {len(audio) / self.sample_rate:.1f}s of audio")
         return audio
+
+    def _pcm_chunks(self, text: str) -> Iterator[np.ndarray]:
+        """Raw int16 PCM straight from Piper, without a WAV container."""
+        if hasattr(self._voice, "synthesize_stream_raw"):
+            # piper-tts 1.2: raw PCM bytes per sentence, wrapped without copying
+            for audio_bytes in self._voice.synthesize_stream_raw(text):
+                yield np.frombuffer(audio_bytes, dtype=np.int16)
+        else:
+            # piper-tts >= 1.3: AudioChunk objects carrying int16 arrays
+            for chunk in self._voice.synthesize(text):
+                yield chunk.audio_int16_array.reshape(-1)
@@ -1,6 +1,11 @@
+import abc
 import gc
 import os
 import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable
 
 logger = logging.getLogger(__name__)
 
@@ -17,16 +22,199 @@ def force_gc():
         pass
 
 
-def log_memory_usage(label: str = ""):
-    """Log current process memory usage."""
+def _read_status_kb(field: str) -> int:
+    """Value of a kB field (VmRSS, VmHWM, ...) from /proc/<pid>/status, 0 if unavailable."""
     try:
         pid = os.getpid()
         with open(f"/proc/{pid}/status", "r") as f:
             for line in f:
-                if line.startswith("VmRSS:"):
-                    rss_kb = int(line.split()[1])
-                    logger.info(f"[Memory {label}] RSS: {rss_kb // 1024} MB")
-                    return rss_kb
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
     except (FileNotFoundError, PermissionError):
         pass
     return 0
+
+
+def read_rss_kb() -> int:
+    """Current resident set size in kB."""
+    return _read_status_kb("VmRSS")
+
+
+def read_peak_rss_kb() -> int:
+    """Peak resident set size in kB since start or the last reset_peak_rss()."""
+    return _read_status_kb("VmHWM")
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter to the current RSS (Linux >= 4.0)."""
+    try:
+        with open(f"/proc/{os.getpid()}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def log_memory_usage(label: str = ""):
+    """Log current process memory usage."""
+    rss_kb = read_rss_kb()
+    if rss_kb:
+        logger.info(f"[Memory {label}] RSS: {rss_kb // 1024} MB")
+    return rss_kb
+
+
+# Estimated resident memory of each model once loaded, MB
+DEFAULT_MODEL_RSS_MB = {
+    "vosk": 300,       # vosk-model-small-ru
+    "embedder": 150,   # rubert-tiny2 (ONNX Runtime session + tokenizer)
+    "tts": 120,        # Piper irina-medium
+    "llm": 1100,       # Vikhr-1B Q3_K_M + context
+}
+
+
+class ModelResidency:
+    """Keeps models loaded while their estimated RSS fits into a RAM budget.
+
+    Models are registered by name with load/unload callbacks. When a new model
+    does not fit, the least recently used unpinned models are unloaded first.
+    """
+
+    def __init__(self, budget_mb: int = 3200, model_rss_mb: dict[str, int] = None):
+        self.budget_mb = budget_mb
+        self.model_rss_mb = dict(DEFAULT_MODEL_RSS_MB)
+        if model_rss_mb:
+            self.model_rss_mb.update(model_rss_mb)
+        self._resident: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def register(self, name: str, cost_mb: int = None) -> None:
+        """Account for a model that is always loaded (never evicted)."""
+        with self._lock:
+            if cost_mb is not None:
+                self.model_rss_mb[name] = cost_mb
+            self._resident[name] = {"unload": None, "pins": 1, "permanent": True}
+        logger.info(f"Resident model '{name}': ~{self._cost(name)} MB "
+                     f"({self.resident_mb()}/{self.budget_mb} MB)")
+
+    def acquire(self, name: str, load: Callable[[], None],
+                unload: Callable[[], None]) -> None:
+        """Make sure a model is loaded and mark it as most recently used."""
+        with self._lock:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                return
+            self._make_room(self._cost(name))
+            load()
+            self._resident[name] = {"unload": unload, "pins": 0, "permanent": False}
+            logger.info(f"Model '{name}' loaded ({self.resident_mb()}/{self.budget_mb} MB)")
+
+    @contextmanager
+    def use(self, name: str, load: Callable[[], None], unload: Callable[[], None]):
+        """Acquire a model and keep it pinned (not evictable) for the block."""
+        with self._lock:
+            self.acquire(name, load, unload)
+            entry = self._resident[name]
+            entry["pins"] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                entry["pins"] -= 1
+
+    @contextmanager
+    def using(self, name: str, load: Callable[[], None], unload: Callable[[], None],
+              loaded: Callable[[], bool]):
+        """Keep a model loaded and pinned for the block.
+
+        A model recorded as resident that loaded() reports as gone (it
+        unloaded itself, e.g. on an idle timeout) is evicted and loaded again.
+        If load() gives up without raising, the model is not accounted for
+        and the block runs without it; the next use tries to load it again.
+        """
+        with self._lock:
+            if name in self._resident and not loaded():
+                self.evict(name)
+            self.acquire(name, load, unload)
+            failed = not loaded()
+            if failed:
+                self.evict(name)
+        if failed:
+            yield
+            return
+        with self.use(name, load, unload):
+            yield
+
+    def evict(self, name: str) -> None:
+        """Unload a model now, if it is resident and not permanent."""
+        with self._lock:
+            entry = self._resident.get(name)
+            if entry is None or entry["permanent"]:
+                return
+            del self._resident[name]
+            entry["unload"]()
+            logger.info(f"Model '{name}' evicted ({self.resident_mb()}/{self.budget_mb} MB)")
+
+    def is_resident(self, name: str) -> bool:
+        with self._lock:
+            return name in self._resident
+
+    def resident_mb(self) -> int:
+        with self._lock:
+            return sum(self._cost(name) for name in self._resident)
+
+    def _cost(self, name: str) -> int:
+        return self.model_rss_mb.get(name, 0)
+
+    def _make_room(self, needed_mb: int) -> None:
+        """Evict least recently used models until needed_mb fits the budget."""
+        for name in list(self._resident):
+            if self.resident_mb() + needed_mb <= self.budget_mb:
+                return
+            if self._resident[name]["pins"] == 0:
+                self.evict(name)
+        if self.resident_mb() + needed_mb > self.budget_mb:
+            logger.warning(
+                f"RAM budget exceeded: {self.resident_mb()} + {needed_mb} > "
+                f"{self.budget_mb} MB (remaining models are in use)"
+            )
+
+
+class ResidentModel(abc.ABC):
+    """Base for components whose model is loaded on demand.
+
+    Subclasses set residency_name and implement load(), unload() and
+    is_loaded(). With a ModelResidency the model stays warm within the RAM
+    budget; without one it is loaded on first use and freed by release().
+    """
+
+    residency_name = ""
+    _residency: ModelResidency = None
+
+    @abc.abstractmethod
+    def load(self):
+        """Load the model into RAM."""
+
+    @abc.abstractmethod
+    def unload(self):
+        """Free the model from RAM."""
+
+    @abc.abstractmethod
+    def is_loaded(self) -> bool:
+        """True while the model is in RAM and usable."""
+
+    @contextmanager
+    def _in_use(self):
+        """Keep the model loaded for the block."""
+        if self._residency is not None:
+            with self._residency.using(self.residency_name, self.load, self.unload,
+                                       self.is_loaded):
+                yield
+            return
+        if not self.is_loaded():
+            self.load()
+        yield
+
+    def release(self):
+        """Done with the model for now: unload unless the residency manager keeps it warm."""
+        if self._residency is None:
+            self.unload()
@@ -0,0 +1,208 @@
+"""Per-stage latency and peak RSS of voice queries, exported in Prometheus text format."""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src.utils.memory import read_peak_rss_kb, read_rss_kb, reset_peak_rss
+
+logger = logging.getLogger(__name__)
+
+# Stages of a query in pipeline order (the export lists them in this order)
+STAGES = (
+    "activation_sound",
+    "recording",
+    "end_of_speech",
+    "asr",
+    "embed",
+    "faiss_search",
+    "sqlite_fetch",
+    "generate",
+    "synthesize",
+    "first_audio",
+)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Tracer:
+    """Rolling per-stage latency samples with p50/p95/p99 and peak RSS.
+
+    Stages are timed with `with tracer.stage(name)` or reported directly with
+    record() when they are measured from timestamps (e.g. recording, which
+    overlaps ASR). The peak RSS of a stage comes from the kernel's VmHWM,
+    reset when a stage starts with no other stage running; for stages that
+    overlap (synthesis runs alongside generation) it is the peak of the
+    overlapping window, so it never under-reports.
+    """
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+        self._counts: dict[str, int] = {}
+        self._sums: dict[str, float] = {}
+        self._peak_rss_kb: dict[str, int] = {}
+        self._active = 0
+        self._hwm_resettable = True
+        self._collectors: list[Callable[[], str]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the block as one sample of stage `name`."""
+        with self._lock:
+            if self._active == 0 and self._hwm_resettable:
+                self._hwm_resettable = reset_peak_rss()
+            self._active += 1
+        start_rss = read_rss_kb()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if self._hwm_resettable:
+                peak = read_peak_rss_kb()
+            else:
+                peak = max(start_rss, read_rss_kb())
+            with self._lock:
+                self._active -= 1
+            self.record(name, elapsed, peak)
+
+    def record(self, name: str, seconds: float, peak_rss_kb: int = None):
+        """Add one latency sample for a stage measured by the caller."""
+        if peak_rss_kb is None:
+            peak_rss_kb = read_rss_kb()
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+                self._sums[name] = 0.0
+                self._peak_rss_kb[name] = 0
+            samples.append(seconds)
+            self._counts[name] += 1
+            self._sums[name] += seconds
+            self._peak_rss_kb[name] = max(self._peak_rss_kb[name], peak_rss_kb)
+
+    def add_collector(self, collect: Callable[[], str]):
+        """Append collect()'s Prometheus text (e.g. cache counters) to every export."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def _stage_names(self) -> list[str]:
+        known = [s for s in STAGES if s in self._samples]
+        return known + sorted(s for s in self._samples if s not in STAGES)
+
+    def summary(self) -> dict:
+        """{stage: {count, sum_s, p50_ms, p95_ms, p99_ms, peak_rss_mb}} over the window."""
+        with self._lock:
+            snapshot = {
+                name: (list(self._samples[name]), self._counts[name],
+                       self._sums[name], self._peak_rss_kb[name])
+                for name in self._stage_names()
+            }
+        result = {}
+        for name, (samples, count, total, peak_kb) in snapshot.items():
+            row = {"count": count, "sum_s": round(total, 4)}
+            for q, value in zip(QUANTILES, np.percentile(samples, [q * 100 for q in QUANTILES])):
+                row[f"p{int(q * 100)}_ms"] = round(float(value) * 1000, 2)
+            row["peak_rss_mb"] = round(peak_kb / 1024, 1)
+            result[name] = row
+        return result
+
+    def prometheus_text(self) -> str:
+        """Current metrics in the Prometheus text exposition format."""
+        with self._lock:
+            snapshot = [
+                (name, list(self._samples[name]), self._counts[name],
+                 self._sums[name], self._peak_rss_kb[name])
+                for name in self._stage_names()
+            ]
+            collectors = list(self._collectors)
+
+        lines = [
+            "# HELP assistant_stage_seconds Latency of each voice query stage.",
+            "# TYPE assistant_stage_seconds summary",
+        ]
+        for name, samples, count, total, _ in snapshot:
+            values = np.percentile(samples, [q * 100 for q in QUANTILES])
+            for q, value in zip(QUANTILES, values):
+                lines.append(f'assistant_stage_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'assistant_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'assistant_stage_seconds_count{{stage="{name}"}} {count}')
+
+        lines += [
+            "# HELP assistant_stage_peak_rss_bytes Peak resident memory seen during a stage.",
+            "# TYPE assistant_stage_peak_rss_bytes gauge",
+        ]
+        for name, _, _, _, peak_kb in snapshot:
+            lines.append(f'assistant_stage_peak_rss_bytes{{stage="{name}"}} {peak_kb * 1024}')
+        text = "\n".join(lines) + "\n"
+        for collect in collectors:
+            text += collect()
+        return text
+
+    def write_prometheus(self, path: str):
+        """Write the metrics file atomically (for node_exporter's textfile collector)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._sums.clear()
+            self._peak_rss_kb.clear()
+
+
+# Process-wide tracer used by the pipeline components
+tracer = Tracer()
+
+
+class MetricsServer:
+    """Serves tracer.prometheus_text() at http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, tracer: Tracer, host: str = "127.0.0.1", port: int = 9105):
+        self.tracer = tracer
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        tracer = self.tracer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True,
+                         name="metrics-server").start()
+        logger.info(f"Metrics at http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
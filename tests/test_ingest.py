@@ -0,0 +1,44 @@
+"""Parallel ingest: a document that fails to parse is skipped on every path."""
+import os
+
+import pytest
+
+from src.rag.document_loader import DocumentLoader
+from src.rag.ingest import IngestPool, iter_parsed
+
+
+class FailingLoader(DocumentLoader):
+    """Raises ValueError for files named broken.txt (module-level: pickled into workers)."""
+
+    def load(self, filepath: str) -> list[str]:
+        if os.path.basename(filepath) == "broken.txt":
+            raise ValueError("unparsable document")
+        return super().load(filepath)
+
+
+@pytest.fixture
+def tasks(tmp_path):
+    paths = []
+    for name in ("first.txt", "broken.txt", "second.txt"):
+        path = tmp_path / name
+        path.write_text(f"Содержимое файла {name}.", encoding="utf-8")
+        paths.append(str(path))
+    return [(path, None) for path in paths]
+
+
+def _parsed_names(results):
+    return sorted(os.path.basename(r.filepath) for r in results if r.chunks)
+
+
+def test_inline_skips_failing_document(tasks):
+    results = list(iter_parsed(FailingLoader(), tasks, workers=1))
+    assert _parsed_names(results) == ["first.txt", "second.txt"]
+
+
+def test_pool_skips_failing_document(tasks):
+    pool = IngestPool(FailingLoader(), workers=2, idle_timeout=None)
+    try:
+        results = list(pool.parse(tasks))
+    finally:
+        pool.shutdown()
+    assert _parsed_names(results) == ["first.txt", "second.txt"]
@@ -0,0 +1,48 @@
+"""Sentence splitting for incremental TTS."""
+from src.tts.synthesizer import iter_sentences, split_sentences
+
+
+def test_splits_at_sentence_end():
+    assert split_sentences("Первое предложение. Второе! Третье? Четвёртое…") == [
+        "Первое предложение.", "Второе!", "Третье?", "Четвёртое…",
+    ]
+
+
+def test_abbreviations_do_not_end_sentences():
+    assert split_sentences("По данным кафедры: ул. Ленина 1. Каб. 5") == [
+        "По данным кафедры: ул. Ленина 1.", "Каб. 5",
+    ]
+
+
+def test_title_abbreviations_and_initials():
+    text = "Заведующий — проф. Иванов А. С. Консультации у доц. Петровой."
+    assert split_sentences(text) == [text]
+
+
+def test_dotted_abbreviations():
+    assert split_sentences("Экзамен переносится, т.е. будет позже. Следите за новостями.") == [
+        "Экзамен переносится, т.е. будет позже.", "Следите за новостями.",
+    ]
+
+
+def test_lowercase_continuation_is_not_a_boundary():
+    assert split_sentences("Звоните по тел. 123-45-67 или пишите.") == [
+        "Звоните по тел. 123-45-67 или пишите.",
+    ]
+
+
+def test_line_breaks_always_split():
+    assert split_sentences("Расписание\nПонедельник: 9:00") == ["Расписание", "Понедельник: 9:00"]
+
+
+def test_streamed_pieces_match_whole_text():
+    text = "По данным кафедры: ул. Ленина 1. Каб. 5, проф. Иванов. Приходите!"
+    pieces = [text[i : i + 3] for i in range(0, len(text), 3)]
+    assert list(iter_sentences(pieces)) == split_sentences(text)
+
+
+def test_stream_waits_for_the_next_token():
+    # "ул." may be followed by a name, so nothing is yielded until it arrives
+    sentences = iter_sentences(["Адрес: ул. ", "Ленина 1. ", "Ждём вас."])
+    assert next(sentences) == "Адрес: ул. Ленина 1."
+    assert list(sentences) == ["Ждём вас."]